@@ -0,0 +1,352 @@
+from array import array
+
+import numpy as np
+
+from Conformation import Conformation, FORWARD, NEXT_HEADING, HEADING_STEP, fused_walk
+
+# Unit steps for the clockwise heading index (0 up, 1 right, 2 down, 3 left). A
+# RIGHT move adds one and a LEFT move subtracts one, so the heading of every bond
+# is the running sum of the encoding.
+CLOCKWISE_DX = np.array([0, 1, 0, -1], dtype=np.int64)
+CLOCKWISE_DY = np.array([1, 0, -1, 0], dtype=np.int64)
+
+
+def decode_batch(encodings):
+    # Absolute x and y of every residue for a (rows, n-2) matrix of encodings.
+    rows, moves = encodings.shape
+    headings = np.cumsum(encodings, axis=1, dtype=np.int64) % 4
+    xs = np.zeros((rows, moves + 2), dtype=np.int64)
+    ys = np.zeros((rows, moves + 2), dtype=np.int64)
+    ys[:, 1] = 1
+    xs[:, 2:] = np.cumsum(CLOCKWISE_DX[headings], axis=1)
+    ys[:, 2:] = 1 + np.cumsum(CLOCKWISE_DY[headings], axis=1)
+    return xs, ys
+
+
+def evaluate_batch(encodings, hydrophobic):
+    # Validity and energy of many encodings in one vectorized pass. Every site is
+    # turned into an integer key; duplicate keys mean a collision and contacts are
+    # found by looking up each residue's +x and +y neighbour keys in the sorted keys
+    # of all rows at once. Invalid rows get fitness 0.
+    rows = encodings.shape[0]
+    length = encodings.shape[1] + 2
+    if rows == 0:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int32)
+    xs, ys = decode_batch(encodings)
+    side = 2 * length + 1
+    keys = (xs + length) * side + (ys + length)
+    keys += (np.arange(rows, dtype=np.int64) * side * side)[:, None]
+
+    ordered = np.sort(keys, axis=1)
+    valid = ~(np.diff(ordered, axis=1) == 0).any(axis=1)
+
+    flat = keys.ravel()
+    order = np.argsort(flat, kind="stable")
+    flatSorted = flat[order]
+    mask = np.asarray(hydrophobic, dtype=bool)
+    residue = np.arange(length)
+    contacts = np.zeros(rows, dtype=np.int32)
+    for offset in (side, 1):
+        target = keys + offset
+        found = np.searchsorted(flatSorted, target.ravel())
+        found = np.minimum(found, flat.size - 1)
+        hit = (flatSorted[found] == target.ravel()).reshape(rows, length)
+        j = (order[found] % length).reshape(rows, length)
+        hit &= mask[None, :] & mask[j] & (np.abs(j - residue[None, :]) > 1)
+        contacts += hit.sum(axis=1, dtype=np.int32)
+    fitness = np.where(valid, -contacts, 0).astype(np.int32)
+    return valid, fitness
+
+
+class ArrayPopulation:
+    # Struct-of-arrays population backend. Every encoding is one row of a contiguous
+    # int8 matrix and fitness/generation live in parallel arrays, so individuals are
+    # plain row indices. Conformation objects are only built on demand (get_fittest,
+    # individual) for printing or inspection. The public surface mirrors Population
+    # so the drivers can use either backend.
+    def __init__(self, size, prot, mutProb, crossProb, seed=None):
+        # Row indices of the parents used during crossover
+        self.parent1 = None
+        self.parent2 = None
+        self.mutProb = mutProb
+        self.crossProb = crossProb
+        self.protein = prot
+        self.size = size
+        self.length = prot.getLength()
+        self.moves = max(self.length - 2, 0)
+        self.hydrophobic = prot.getHydrophobic()
+        self.rng = np.random.default_rng(seed)
+
+        self.encodings = np.zeros((size, self.moves), dtype=np.int8)
+        self.fitness = np.zeros(size, dtype=np.int32)
+        self.generation = np.zeros(size, dtype=np.int32)
+        # Raw row bytes of the current encodings, to keep the population unique
+        self.setOfConformations = set()
+        # Encodings inserted so far, including the initial ones
+        self.insertedCount = 0
+        # Children produced by crossover so far, whether inserted or not
+        self.offspringCount = 0
+        # Of those, the children that replaced a parent and the ones that did not
+        self.acceptedCount = 0
+        self.rejectedCount = 0
+        # Energy evaluations spent on this population (see Population.evaluations)
+        self.evaluations = 0
+
+        print("Generate Population:")
+        i = 0
+        while i < self.size:
+            row = self.random_valid_row()
+            valid, fitness = self.evaluate_row(row)
+            key = row.tobytes()
+            # Only insert if fitness is not zero and is unique
+            if fitness != 0 and key not in self.setOfConformations:
+                self.encodings[i] = row
+                self.fitness[i] = fitness
+                self.setOfConformations.add(key)
+                self.insertedCount += 1
+                print(f"{i}.", end="", flush=True)
+                i += 1
+
+        self.fittestIndex = 0
+        self._fittestConf = None
+        self.set_fittest()
+        print()
+
+    def __len__(self):
+        return self.size
+
+    def random_valid_row(self):
+        # Random turns repaired by mutate_row(0.1) until the walk is self-avoiding,
+        # as Conformation.generate_random_conformation does.
+        row = self.rng.integers(-1, 2, self.moves).astype(np.int8)
+        while not fused_walk(row.tolist(), self.hydrophobic, False)[0]:
+            self.mutate_row(row, 0.1)
+        return row
+
+    def evaluate_row(self, row):
+        # Validate and score one encoding row; only valid rows count as evaluations.
+        valid, fitness, _, _, _ = fused_walk(row.tolist(), self.hydrophobic)
+        if valid:
+            Conformation.energyEvalSteps += 1
+            self.evaluations += 1
+        return valid, fitness
+
+    def individual(self, i):
+        # Build a Conformation for row i.
+        conf = Conformation()
+        conf.protein = self.protein
+        conf.length = self.length
+        conf.encoding = array('b', self.encodings[i].tobytes())
+        conf.generation = int(self.generation[i])
+        conf.evaluate(score=False)
+        conf.fitness = int(self.fitness[i])
+        return conf
+
+    def is_insertable(self, row):
+        # Check if an encoding row is new to the population
+        return row.tobytes() not in self.setOfConformations
+
+    def set_fittest(self):
+        # argmin returns the first of equally fit rows, like Population's scan
+        self.fittestIndex = int(np.argmin(self.fitness))
+        self._fittestConf = None
+
+    def get_fittest(self):
+        if self._fittestConf is None:
+            self._fittestConf = self.individual(self.fittestIndex)
+        return self._fittestConf
+
+    def tournament_select(self, tournament_size: int = 3) -> int:
+        participants = self.rng.choice(self.size, tournament_size, replace=False)
+        # The first participant with the lowest energy wins, as min() does.
+        return int(participants[np.argmin(self.fitness[participants])])
+
+    # Row-level genetic operators, matching the Conformation ones.
+    def crossover_rows(self, i1, i2):
+        # One-point crossover: first part from row i1, second from row i2.
+        child = self.encodings[i2].copy()
+        if self.moves > 0:
+            cut = self.rng.integers(0, self.moves)
+            child[:cut] = self.encodings[i1, :cut]
+        return child
+
+    def mutate_row(self, row, probability):
+        op_choice = self.rng.random()
+        if op_choice < 0.33:
+            self.mutate_directed_row(row, probability)
+        elif op_choice < 0.66:
+            self.mutate_corner_flip_row(row, probability)
+        else:
+            self.mutate_crankshaft_row(row, probability)
+
+    def mutate_directed_row(self, row, probability):
+        # Replace each selected move by one of the two other moves.
+        mask = self.rng.random(self.moves) <= probability
+        shift = self.rng.integers(1, 3, self.moves)
+        row[mask] = (row[mask] + 1 + shift[mask]) % 3 - 1
+
+    def mutate_corner_flip_row(self, row, probability):
+        # A residue is a corner exactly when the move before it turns.
+        mask = (self.rng.random(self.moves) <= probability) & (row != FORWARD)
+        row[mask] = -row[mask]
+
+    def mutate_crankshaft_row(self, row, probability):
+        if self.length < 4:
+            return
+        if self.rng.random() <= probability:
+            i = int(self.rng.integers(1, self.length - 2))
+            positions, headings = self.decode_row(row)
+            p0 = positions[i-1]
+            p3 = positions[i+2]
+            if abs(p0[0] - p3[0]) == 1 and abs(p0[1] - p3[1]) == 1:
+                new_p1 = (p0[0], p3[1])
+                new_p2 = (p3[0], p0[1])
+                heading1 = HEADING_STEP.index((new_p1[0] - p0[0], new_p1[1] - p0[1]))
+                heading2 = HEADING_STEP.index((new_p2[0] - new_p1[0], new_p2[1] - new_p1[1]))
+                row[i-1] = self.relative_move(headings[i-1], heading1)
+                row[i] = self.relative_move(heading1, heading2)
+
+    def decode_row(self, row):
+        # Absolute positions and the heading into each residue, collisions included.
+        x, y = 0, 1
+        heading = 0
+        positions = [(0, 0), (0, 1)]
+        headings = [0, 0]
+        for d in row.tolist():
+            heading = NEXT_HEADING[heading][d + 1]
+            dx, dy = HEADING_STEP[heading]
+            x += dx
+            y += dy
+            positions.append((x, y))
+            headings.append(heading)
+        return positions, headings
+
+    @staticmethod
+    def relative_move(prev_heading, new_heading):
+        for d in (-1, 0, 1):
+            if NEXT_HEADING[prev_heading][d + 1] == new_heading:
+                return d
+        # A 180° turn should not occur in a valid conformation.
+        return FORWARD
+
+    def tournament_select_batch(self, count, tournament_size: int = 3):
+        # count independent tournaments over distinct participants.
+        participants = self.rng.integers(0, self.size, (count, tournament_size))
+        if self.size >= tournament_size:
+            ordered = np.sort(participants, axis=1)
+            repeated = np.flatnonzero((np.diff(ordered, axis=1) == 0).any(axis=1))
+            for r in repeated:
+                participants[r] = self.rng.choice(self.size, tournament_size, replace=False)
+        winners = np.argmin(self.fitness[participants], axis=1)
+        return participants[np.arange(count), winners]
+
+    def mutate_batch(self, children, probability):
+        # Apply mutate_row to every row of children, with the operator draws and
+        # masks done on the whole matrix.
+        count = children.shape[0]
+        op_choice = self.rng.random(count)
+        draws = self.rng.random(children.shape) <= probability
+
+        directed = (op_choice < 0.33)[:, None] & draws
+        shift = self.rng.integers(1, 3, children.shape)
+        children[directed] = (children[directed] + 1 + shift[directed]) % 3 - 1
+
+        corner = ((op_choice >= 0.33) & (op_choice < 0.66))[:, None] & draws & (children != FORWARD)
+        children[corner] = -children[corner]
+
+        for r in np.flatnonzero(op_choice >= 0.66):
+            self.mutate_crankshaft_row(children[r], probability)
+
+    def crossover_batch(self, batchSize):
+        # batchSize crossover() steps at once: tournaments, one-point crossover and
+        # mutation are array operations and all offspring are scored by a single
+        # evaluate_batch call. Replacement then walks the pairs in order with the
+        # same rules as crossover(), so a parent replaced earlier in the batch is
+        # compared at its new fitness. Parents are all drawn from the population as
+        # it was before the batch.
+        p1 = self.tournament_select_batch(batchSize)
+        p2 = self.tournament_select_batch(batchSize)
+        active = (self.rng.random(batchSize) <= self.crossProb) & (self.rng.random(batchSize) <= self.crossProb)
+        p1 = p1[active]
+        p2 = p2[active]
+        pairs = p1.size
+        if pairs == 0:
+            return
+
+        columns = np.arange(self.moves)
+        cuts = self.rng.integers(0, max(self.moves, 1), (2, pairs))
+        children = np.empty((2 * pairs, self.moves), dtype=np.int8)
+        children[:pairs] = np.where(columns[None, :] < cuts[0][:, None], self.encodings[p1], self.encodings[p2])
+        children[pairs:] = np.where(columns[None, :] < cuts[1][:, None], self.encodings[p2], self.encodings[p1])
+        self.mutate_batch(children, self.mutProb)
+        self.offspringCount += 2 * pairs
+
+        valid, fitness = evaluate_batch(children, self.hydrophobic)
+        Conformation.energyEvalSteps += int(valid.sum())
+        self.evaluations += int(valid.sum())
+        generations = (self.generation[p1] + self.generation[p2]) // 2 + 1
+
+        for k in range(pairs):
+            a, b = int(p1[k]), int(p2[k])
+            for child, first, second in ((k, a, b), (pairs + k, b, a)):
+                self.offer_row(children[child], valid[child], fitness[child], first, second, generations[k])
+            for p in (a, b):
+                if self.fitness[p] < self.fitness[self.fittestIndex]:
+                    self.fittestIndex = p
+                    self._fittestConf = None
+        self.parent1, self.parent2 = int(p1[-1]), int(p2[-1])
+
+    def offer_row(self, child, valid, fitness, first, second, generation):
+        # Let an evaluated child replace the weaker of its parents if it is valid, new
+        # and fitter, and count the outcome
+        if valid and self.is_insertable(child):
+            if fitness < self.fitness[first]:
+                self.replace(first, child, fitness, generation)
+                self.acceptedCount += 1
+                return
+            if fitness < self.fitness[second]:
+                self.replace(second, child, fitness, generation)
+                self.acceptedCount += 1
+                return
+        self.rejectedCount += 1
+
+    def replace(self, i, child, fitness, generation):
+        # Overwrite row i and move its entry in the dedup index
+        self.setOfConformations.discard(self.encodings[i].tobytes())
+        self.setOfConformations.add(child.tobytes())
+        self.insertedCount += 1
+        self.encodings[i] = child
+        self.fitness[i] = fitness
+        self.generation[i] = generation
+        if i == self.fittestIndex:
+            self._fittestConf = None
+
+    def crossover(self):
+        # Same flow and replacement rules as Population.crossover, on matrix rows.
+        self.parent1 = self.tournament_select()
+        if self.crossProb < self.rng.random():
+            return
+
+        self.parent2 = self.tournament_select()
+        if self.crossProb < self.rng.random():
+            return
+
+        p1, p2 = self.parent1, self.parent2
+        generation = (int(self.generation[p1]) + int(self.generation[p2])) // 2 + 1
+        child1 = self.crossover_rows(p1, p2)
+        child2 = self.crossover_rows(p2, p1)
+        self.offspringCount += 2
+
+        self.mutate_row(child1, self.mutProb)
+        valid, fitness = self.evaluate_row(child1)
+        self.offer_row(child1, valid, fitness, p1, p2, generation)
+
+        self.mutate_row(child2, self.mutProb)
+        valid, fitness = self.evaluate_row(child2)
+        self.offer_row(child2, valid, fitness, p2, p1, generation)
+
+        # Update the fittest individual if any parent improved.
+        for p in (p1, p2):
+            if self.fitness[p] < self.fitness[self.fittestIndex]:
+                self.fittestIndex = p
+                self._fittestConf = None
@@ -0,0 +1,30 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    # Fixed-memory probabilistic set of integer keys. Membership tests never miss an
+    # added key but may report keys that were never added; false_positive_rate()
+    # estimates how often from the number of keys added so far.
+    def __init__(self, bits: int, hashes: int = 4):
+        self.bits = max(bits, 8)
+        self.hashes = hashes
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _indexes(self, key: int):
+        digest = hashlib.blake2b(key.to_bytes((key.bit_length() + 8) // 8, 'big'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: int):
+        for i in self._indexes(key):
+            self.array[i >> 3] |= 1 << (i & 7)
+        self.count += 1
+
+    def __contains__(self, key: int) -> bool:
+        return all(self.array[i >> 3] & (1 << (i & 7)) for i in self._indexes(key))
+
+    def false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
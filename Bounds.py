@@ -0,0 +1,60 @@
+import os
+
+from Protein import Protein
+
+SEQUENCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "protein_sequence.txt")
+
+
+def read_sequences(path=SEQUENCE_FILE):
+    # (length, sequence, known optimum) of every "# length = sequence = energy" line
+    sequences = []
+    with open(path) as file:
+        for line in file:
+            parts = [part.strip() for part in line.lstrip("#").split("=")]
+            if len(parts) == 3 and parts[0].isdigit():
+                sequences.append((int(parts[0]), parts[1], int(parts[2])))
+    return sequences
+
+
+def load_registry(path=SEQUENCE_FILE):
+    # Known optimum energy of every sequence annotated in the file, by sequence
+    return {sequence: optimum for _, sequence, optimum in read_sequences(path)}
+
+
+# Known optima of protein_sequence.txt, loaded on first use
+registry = None
+
+
+def known_optimum(sequence):
+    # Best energy known for the sequence, or None if it is not in protein_sequence.txt
+    global registry
+    if registry is None:
+        registry = load_registry()
+    return registry.get(sequence)
+
+
+def energy_lower_bound(prot: Protein) -> int:
+    # Provable lower bound on the energy of any fold. The square lattice is
+    # bipartite, so residue i always sits on the sublattice of i's parity and an
+    # H-H contact joins an even and an odd residue. An inner residue has two of its
+    # four neighbours taken by the chain, leaving at most two contacts; a chain end
+    # has three. Every contact uses one slot of each parity class, so the contacts
+    # are at most the smaller class's total.
+    hydrophobic = prot.getHydrophobic()
+    n = len(hydrophobic)
+    if n < 4:
+        return 0
+    slots = [0, 0]
+    for i, h in enumerate(hydrophobic):
+        if h:
+            slots[i % 2] += 3 if i == 0 or i == n - 1 else 2
+    return -min(slots)
+
+
+def target_energy(prot: Protein):
+    # (energy a run can stop at, where it came from): the known optimum if the
+    # sequence has one, else the lower bound, which no fold can beat.
+    optimum = known_optimum(prot.sequence)
+    if optimum is not None:
+        return optimum, "known optimum"
+    return energy_lower_bound(prot), "lower bound"
@@ -0,0 +1,232 @@
+import mmap
+import os
+import random
+import struct
+import threading
+from array import array
+
+from Conformation import Conformation, MUTATIONS, pack_encoding, unpack_encoding
+from FitnessIndex import FitnessIndex
+from Protein import Protein
+from Population import Population, SELECTIONS
+
+# File layout: HEADER, the protein sequence (one byte per residue), the RNG state,
+# the adaptive operator state (if any), the history filter bits (if any), then one fixed-size record per individual in
+# population order: RECORD (fitness, generation) followed by the 2-bit packed
+# encoding. Records sit at fixed offsets, so a memory-mapped file can be read
+# one individual at a time (CheckpointFile.record). The records are followed by
+# the population's fitness ranking, as RANK indices into the records.
+MAGIC = b"HPCK"
+VERSION = 5
+HEADER = struct.Struct("<4sHHIIIddQQQQQQQQQIIQQQQQ")
+RNG = struct.Struct("<625I?d")
+# Per mutation operator: quality, then uses, valid, new and accepted children
+OPERATORS = struct.Struct("<" + "d4Q" * len(MUTATIONS))
+RECORD = struct.Struct("<hI")
+RANK = "I"
+# Flag bits; the bits above them hold the index of the selection method in SELECTIONS
+CANONICAL_KEYS = 1
+REPAIR_COLLISIONS = 2
+ADAPTIVE_OPERATORS = 4
+SELECTION_SHIFT = 3
+
+
+def snapshot(pop: Population) -> bytes:
+    # Full state of a Population between two crossover steps, its evaluation counter
+    # included, plus the global RNG state, as one checkpoint image.
+    moves = max(pop.protein.getLength() - 2, 0)
+    history = pop.historyFilter
+    search = pop.localSearch
+    operators = pop.operators
+    flags = (CANONICAL_KEYS if pop.canonicalKeys else 0) | (REPAIR_COLLISIONS if pop.repairCollisions else 0) | \
+        (ADAPTIVE_OPERATORS if operators is not None else 0)
+    parts = [HEADER.pack(
+        MAGIC, VERSION, flags | SELECTIONS.index(pop.selection) << SELECTION_SHIFT,
+        pop.protein.getLength(),
+        len(pop.individuals), pop.individuals.index(pop.theFittest), pop.mutProb, pop.crossProb,
+        pop.evaluations, pop.insertedCount, pop.offspringCount, pop.duplicateSkips, pop.symmetrySkips,
+        pop.initRejected, pop.initDeadEnds,
+        history.bits if history is not None else 0, history.count if history is not None else 0,
+        history.hashes if history is not None else 0,
+        search.budget if search is not None else 0, search.calls if search is not None else 0,
+        search.evaluations if search is not None else 0, search.improvements if search is not None else 0,
+        pop.repairAttempts, pop.repairSaved)]
+    parts.append(pop.protein.sequence.encode("ascii"))
+    _, state, gauss = random.getstate()
+    parts.append(RNG.pack(*state, gauss is not None, gauss or 0.0))
+    if operators is not None:
+        parts.append(OPERATORS.pack(*[value for op in MUTATIONS for value in (
+            operators.quality[op], operators.uses[op], operators.valid[op], operators.new[op], operators.accepted[op])]))
+    if history is not None:
+        parts.append(bytes(history.array))
+    for indiv in pop.individuals:
+        parts.append(RECORD.pack(indiv.get_fitness(), indiv.get_generation()))
+        parts.append(pack_encoding(indiv.get_encoding()) if moves else b"")
+    # Individuals of equal fitness are drawn by their place in the ranking, so it is saved as is
+    indexOf = {id(indiv): i for i, indiv in enumerate(pop.individuals)}
+    parts.append(array(RANK, [indexOf[id(indiv)] for indiv in pop.fitnessIndex.ranked]).tobytes())
+    return b"".join(parts)
+
+
+def write_checkpoint(path, data):
+    # Replace the file atomically, so an interrupted write leaves the last checkpoint intact.
+    temp = path + ".tmp"
+    with open(temp, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+
+
+class CheckpointFile:
+    # Memory-mapped, read-only view of a checkpoint file.
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, flags, self.residues, self.size, self.fittest, self.mutProb, self.crossProb,
+         self.evaluations, self.insertedCount, self.offspringCount, self.duplicateSkips, self.symmetrySkips,
+         self.initRejected, self.initDeadEnds, self.historyBits, self.historyCount, self.historyHashes,
+         self.localSearchBudget, self.localSearchCalls, self.localSearchEvaluations,
+         self.localSearchImprovements, self.repairAttempts, self.repairSaved) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Not a version " + str(VERSION) + " checkpoint: " + str(path))
+        self.canonicalKeys = bool(flags & CANONICAL_KEYS)
+        self.repairCollisions = bool(flags & REPAIR_COLLISIONS)
+        self.adaptiveOperators = bool(flags & ADAPTIVE_OPERATORS)
+        self.selection = SELECTIONS[flags >> SELECTION_SHIFT]
+        self.moves = max(self.residues - 2, 0)
+        self.width = (self.moves + 3) // 4
+        offset = HEADER.size
+        self.sequence = self.map[offset:offset + self.residues].decode("ascii")
+        offset += self.residues
+        self.rngOffset = offset
+        offset += RNG.size
+        self.operatorOffset = offset
+        offset += OPERATORS.size if self.adaptiveOperators else 0
+        self.historyOffset = offset
+        offset += (self.historyBits + 7) // 8 if self.historyBits else 0
+        self.recordOffset = offset
+        self.rankOffset = offset + self.size * (RECORD.size + self.width)
+
+    def rng_state(self):
+        values = RNG.unpack_from(self.map, self.rngOffset)
+        return (3, tuple(values[:625]), values[626] if values[625] else None)
+
+    def ranking(self):
+        # Record indices from the fittest to the least fit individual
+        ranks = array(RANK)
+        ranks.frombytes(self.map[self.rankOffset:self.rankOffset + self.size * ranks.itemsize])
+        return ranks
+
+    def operator_state(self):
+        # {operator: (quality, uses, valid, new, accepted)} of the adaptive operator selector
+        values = OPERATORS.unpack_from(self.map, self.operatorOffset)
+        return {op: values[5 * i:5 * i + 5] for i, op in enumerate(MUTATIONS)}
+
+    def history_bits(self):
+        return self.map[self.historyOffset:self.recordOffset]
+
+    def record(self, i):
+        # (fitness, generation, encoding) of the i-th individual
+        offset = self.recordOffset + i * (RECORD.size + self.width)
+        fitness, generation = RECORD.unpack_from(self.map, offset)
+        offset += RECORD.size
+        encoding = array('b', unpack_encoding(self.map[offset:offset + self.width], self.moves))
+        return fitness, generation, encoding
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_checkpoint(path) -> Population:
+    # Rebuild the Population of a checkpoint and restore the RNG state and evaluation
+    # counter, so the run continues exactly as if it had never stopped. Only scratch
+    # state is lost: delta-evaluation bases, metrics, the accepted/rejected child
+    # counters and any fitness cache start empty.
+    with CheckpointFile(path) as ckpt:
+        prot = Protein(ckpt.sequence)
+        pop = Population(ckpt.size, prot, ckpt.mutProb, ckpt.crossProb, historyBits=ckpt.historyBits,
+                         initMethod=None, canonicalKeys=ckpt.canonicalKeys,
+                         localSearchBudget=ckpt.localSearchBudget, selection=ckpt.selection,
+                         repairCollisions=ckpt.repairCollisions, adaptiveOperators=ckpt.adaptiveOperators)
+        for i in range(ckpt.size):
+            fitness, generation, encoding = ckpt.record(i)
+            conf = Conformation(prot)
+            conf.setOfPoints = pop.collisionSet
+            conf.encoding = encoding
+            conf.evaluate(score=False)
+            conf.fitness = fitness
+            conf.generation = generation
+            pop.individuals.append(conf)
+            # The dedup index holds exactly the keys of the live individuals
+            pop.setOfConformations.add(pop.key_of(conf))
+        # sorted() is stable, so indexing the saved ranking reproduces it exactly
+        pop.fitnessIndex = FitnessIndex([pop.individuals[i] for i in ckpt.ranking()])
+        pop.theFittest = pop.individuals[ckpt.fittest]
+        pop.insertedCount = ckpt.insertedCount
+        pop.offspringCount = ckpt.offspringCount
+        pop.duplicateSkips = ckpt.duplicateSkips
+        pop.symmetrySkips = ckpt.symmetrySkips
+        pop.initRejected = ckpt.initRejected
+        pop.initDeadEnds = ckpt.initDeadEnds
+        pop.repairAttempts = ckpt.repairAttempts
+        pop.repairSaved = ckpt.repairSaved
+        if pop.historyFilter is not None:
+            pop.historyFilter.array[:] = ckpt.history_bits()
+            pop.historyFilter.count = ckpt.historyCount
+            pop.historyFilter.hashes = ckpt.historyHashes
+        if pop.localSearch is not None:
+            pop.localSearch.calls = ckpt.localSearchCalls
+            pop.localSearch.evaluations = ckpt.localSearchEvaluations
+            pop.localSearch.improvements = ckpt.localSearchImprovements
+        if pop.operators is not None:
+            operators = pop.operators
+            for op, (quality, uses, valid, new, accepted) in ckpt.operator_state().items():
+                operators.quality[op] = quality
+                operators.uses[op] = uses
+                operators.valid[op] = valid
+                operators.new[op] = new
+                operators.accepted[op] = accepted
+            operators.probabilities = operators.matched_probabilities()
+        random.setstate(ckpt.rng_state())
+        pop.evaluations = ckpt.evaluations
+        Conformation.energyEvalSteps = ckpt.evaluations
+    return pop
+
+
+class Checkpointer:
+    # Saves a Population every interval crossover steps. The snapshot is taken
+    # synchronously between two steps, so it is consistent; writing it to disk
+    # happens in a background thread while evolution continues.
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self.steps = 0
+        self.saved = 0
+        self.writer = None
+
+    def step(self, pop):
+        # Call once per crossover step.
+        self.steps += 1
+        if self.steps % self.interval == 0:
+            self.save(pop)
+
+    def save(self, pop):
+        data = snapshot(pop)
+        self.wait()
+        self.writer = threading.Thread(target=write_checkpoint, args=(self.path, data))
+        self.writer.start()
+        self.saved += 1
+
+    def wait(self):
+        # Block until the last checkpoint is on disk.
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
@@ -1,4 +1,6 @@
 import random
+from array import array
+from itertools import accumulate
 from typing import List, Tuple
 import Protein
 
@@ -7,11 +9,328 @@ FORWARD = 0
 LEFT = -1
 RIGHT = 1
 
+# Heading after applying a move, indexed by [heading][move + 1]. Headings follow
+# calculate_absolute_position: 0 up, 1 down, 2 right, 3 left.
+NEXT_HEADING = ((3, 0, 2), (2, 1, 3), (0, 2, 1), (1, 3, 0))
+# Unit step (dx, dy) taken when moving along each heading.
+HEADING_STEP = ((0, 1), (0, -1), (1, 0), (-1, 0))
+# Offsets of the four lattice neighbours of a site.
+NEIGHBOURS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+# Heading of a unit step, the inverse of HEADING_STEP.
+STEP_HEADING = {step: heading for heading, step in enumerate(HEADING_STEP)}
+# Move turning one heading into another, the inverse of NEXT_HEADING; indexed by
+# [heading][next heading]. Reversals (None) never occur in a self-avoiding walk.
+TURN = tuple(tuple(NEXT_HEADING[h].index(n) - 1 if n in NEXT_HEADING[h] else None for n in range(4))
+             for h in range(4))
+# Mutation operators, by the names mutate() returns; each is the method mutate_<name>.
+MUTATIONS = ("directed", "corner_flip", "crankshaft")
+# Moves decoded per table lookup by decode_walk.
+CHUNK_MOVES = 6
+
+
+def chunk_table(heading):
+    # For every run of 1..CHUNK_MOVES moves (keyed by its signed-byte encoding) taken
+    # from the given heading: the x steps, the y steps and the heading afterwards.
+    table = {}
+    chunks = [()]
+    for _ in range(CHUNK_MOVES):
+        chunks = [chunk + (d,) for chunk in chunks for d in (LEFT, FORWARD, RIGHT)]
+        for chunk in chunks:
+            h = heading
+            xs = []
+            ys = []
+            for d in chunk:
+                h = NEXT_HEADING[h][d + 1]
+                dx, dy = HEADING_STEP[h]
+                xs.append(dx)
+                ys.append(dy)
+            table[array('b', chunk).tobytes()] = (xs, ys, h)
+    return table
+
+
+# Chunk tables indexed by [heading][chunk bytes].
+CHUNK_TABLE = tuple(chunk_table(h) for h in range(4))
+
+
+def fused_walk(encoding, hydrophobic, score=True):
+    # Walks the encoding once, stopping at the first collision. When score is set,
+    # H-H contacts are counted on the way by looking up the already placed lattice
+    # neighbours of every new hydrophobic residue in the occupancy map.
+    # Returns (valid, fitness, positions, occupied, trace) where trace[i] is the
+    # energy of the contacts among residues 0..i; on a collision positions only
+    # holds the residues placed before it.
+    x, y = 0, 1
+    positions = [(0, 0), (0, 1)]
+    occupied = {(0, 0): 0, (0, 1): 1}
+    trace = [0, 0]
+    fitness = 0
+    heading = 0
+    i = 1
+    for d in encoding:
+        heading = NEXT_HEADING[heading][d + 1]
+        dx, dy = HEADING_STEP[heading]
+        x += dx
+        y += dy
+        pos = (x, y)
+        if pos in occupied:
+            return False, 0, positions, occupied, trace
+        i += 1
+        occupied[pos] = i
+        positions.append(pos)
+        if score and hydrophobic[i]:
+            for nx, ny in NEIGHBOURS:
+                j = occupied.get((x + nx, y + ny))
+                if j is not None and j < i - 1 and hydrophobic[j]:
+                    fitness -= 1
+        trace.append(fitness)
+    return True, fitness, positions, occupied, trace
+
+
+def delta_walk(encoding, hydrophobic, base, start, score=True):
+    # Re-walks only residues start.. of a conformation whose encoding matches the
+    # valid, scored walk in base = (positions, occupied, trace) up to residue start-1.
+    # The prefix keeps the parent's contacts (trace[start-1]); only contacts that
+    # touch a moved residue are counted again. Returns the same tuple as fused_walk.
+    basePositions, baseOccupied, baseTrace = base
+    positions = basePositions[:start]
+    trace = baseTrace[:start]
+    fitness = trace[-1]
+    # Start from the parent's map with the moved residues taken out.
+    occupied = baseOccupied.copy()
+    for pos in basePositions[start:]:
+        del occupied[pos]
+    x, y = positions[-1]
+    px, py = positions[-2]
+    heading = STEP_HEADING[(x - px, y - py)]
+    i = start - 1
+    for d in encoding[start - 2:]:
+        heading = NEXT_HEADING[heading][d + 1]
+        dx, dy = HEADING_STEP[heading]
+        x += dx
+        y += dy
+        pos = (x, y)
+        if pos in occupied:
+            return False, 0, positions, occupied, trace
+        i += 1
+        occupied[pos] = i
+        positions.append(pos)
+        if score and hydrophobic[i]:
+            for nx, ny in NEIGHBOURS:
+                j = occupied.get((x + nx, y + ny))
+                if j is not None and j < i - 1 and hydrophobic[j]:
+                    fitness -= 1
+        trace.append(fitness)
+    return True, fitness, positions, occupied, trace
+
+
+def contact_energy(positions, hydrophobic):
+    # Counts H-H contacts of an already decoded walk via an occupancy map.
+    # Returns None if the walk is not self-avoiding, as the lookup needs one
+    # residue per site.
+    occupied = {}
+    for i, pos in enumerate(positions):
+        occupied[pos] = i
+    if len(occupied) != len(positions):
+        return None
+    fitness = 0
+    for i, (x, y) in enumerate(positions):
+        if hydrophobic[i]:
+            for nx, ny in NEIGHBOURS:
+                j = occupied.get((x + nx, y + ny))
+                if j is not None and j > i + 1 and hydrophobic[j]:
+                    fitness -= 1
+    return fitness
+
+
+def grow_walk(length, rand=random, maxDeadEnds=None):
+    # Builds a self-avoiding walk one residue at a time, only ever stepping onto a
+    # free lattice site (tried in random order) and backtracking out of dead ends.
+    # A walk that hits maxDeadEnds (default 10 * length) dead ends is abandoned and
+    # grown again from scratch. Returns (encoding, deadEnds, restarts).
+    moves = max(length - 2, 0)
+    if maxDeadEnds is None:
+        maxDeadEnds = 10 * length
+    deadEnds = 0
+    restarts = 0
+    while True:
+        encoding = []
+        path = [(0, 0), (0, 1)]
+        headings = [0]
+        occupied = {(0, 0), (0, 1)}
+        options = [rand.sample((LEFT, FORWARD, RIGHT), 3)]
+        stuck = 0
+        while len(encoding) < moves and stuck < maxDeadEnds:
+            placed = False
+            while options[-1]:
+                d = options[-1].pop()
+                heading = NEXT_HEADING[headings[-1]][d + 1]
+                dx, dy = HEADING_STEP[heading]
+                x, y = path[-1]
+                pos = (x + dx, y + dy)
+                if pos not in occupied:
+                    occupied.add(pos)
+                    path.append(pos)
+                    headings.append(heading)
+                    encoding.append(d)
+                    options.append(rand.sample((LEFT, FORWARD, RIGHT), 3))
+                    placed = True
+                    break
+            if not placed:
+                # Dead end: step back one residue and try its remaining moves.
+                stuck += 1
+                options.pop()
+                encoding.pop()
+                headings.pop()
+                occupied.discard(path.pop())
+        deadEnds += stuck
+        if len(encoding) == moves:
+            return encoding, deadEnds, restarts
+        restarts += 1
+
+
+def repair_walk(encoding, rand=random, maxDeadEnds=None):
+    # Makes a colliding walk self-avoiding by re-growing it from its first collision.
+    # Every later move is kept if it lands on a free site; otherwise the other two
+    # are tried in random order, backtracking out of dead ends as grow_walk does.
+    # The prefix before the collision is never changed. Returns (encoding, first
+    # changed index), or (None, None) when the suffix cannot be re-grown within
+    # maxDeadEnds (default 2 * length) dead ends.
+    moves = len(encoding)
+    if maxDeadEnds is None:
+        maxDeadEnds = 2 * (moves + 2)
+    path = [(0, 0), (0, 1)]
+    headings = [0]
+    occupied = {(0, 0), (0, 1)}
+    start = None
+    for k, d in enumerate(encoding):
+        heading = NEXT_HEADING[headings[-1]][d + 1]
+        dx, dy = HEADING_STEP[heading]
+        x, y = path[-1]
+        pos = (x + dx, y + dy)
+        if pos in occupied:
+            start = k
+            break
+        occupied.add(pos)
+        path.append(pos)
+        headings.append(heading)
+    if start is None:
+        return array('b', encoding), None
+    repaired = array('b', encoding)
+    # Moves still to try at each re-grown index, popped from the end: the original
+    # move first, then None, which stands for the two alternatives in random order.
+    options = []
+    stuck = 0
+    k = start
+    while k < moves:
+        if len(options) == k - start:
+            options.append([None, encoding[k]])
+        remaining = options[-1]
+        placed = False
+        while remaining:
+            d = remaining.pop()
+            if d is None:
+                others = [m for m in (LEFT, FORWARD, RIGHT) if m != encoding[k]]
+                if rand.random() < 0.5:
+                    others.reverse()
+                remaining.extend(others)
+                continue
+            heading = NEXT_HEADING[headings[-1]][d + 1]
+            dx, dy = HEADING_STEP[heading]
+            x, y = path[-1]
+            pos = (x + dx, y + dy)
+            if pos not in occupied:
+                occupied.add(pos)
+                path.append(pos)
+                headings.append(heading)
+                repaired[k] = d
+                placed = True
+                break
+        if placed:
+            k += 1
+            continue
+        # Dead end: step back one move and try its remaining options.
+        stuck += 1
+        options.pop()
+        if not options or stuck >= maxDeadEnds:
+            return None, None
+        k -= 1
+        headings.pop()
+        occupied.discard(path.pop())
+    return repaired, start
+
+
+def encode_positions(positions):
+    # Relative encoding of a walk given by its lattice positions. The encoding does
+    # not depend on where the walk starts or which way it first points.
+    headings = [STEP_HEADING[(x1 - x0, y1 - y0)]
+                for (x0, y0), (x1, y1) in zip(positions, positions[1:])]
+    return array('b', [TURN[h0][h1] for h0, h1 in zip(headings, headings[1:])])
+
+
+def decode_walk(encoding):
+    # Absolute positions of every residue, collisions included: one table lookup per
+    # CHUNK_MOVES moves collects the unit steps, which are then summed up in one go.
+    # A whole population is decoded at once by ArrayPopulation.decode_batch.
+    data = encoding.tobytes() if hasattr(encoding, "tobytes") else array('b', encoding).tobytes()
+    xs = [0, 0]
+    ys = [0, 1]
+    heading = 0
+    for k in range(0, len(data), CHUNK_MOVES):
+        dx, dy, heading = CHUNK_TABLE[heading][data[k:k + CHUNK_MOVES]]
+        xs += dx
+        ys += dy
+    return list(zip(accumulate(xs), accumulate(ys)))
+
+
+def packed_key(encoding):
+    # The moves as one integer, 2 bits each (move + 1) with the first move in the
+    # high bits, so keys of equally long encodings sort like the encodings.
+    key = 0
+    for d in encoding:
+        key = (key << 2) | (d + 1)
+    return key
+
+
+def canonical_key(encoding):
+    # An encoding and its mirror image (LEFT and RIGHT swapped) fold to the same
+    # energy. Mirroring maps every 2-bit digit d to 2 - d, so the mirror's key is
+    # the all-RIGHT key minus this one; the smaller of the two is canonical.
+    key = packed_key(encoding)
+    mirror = 2 * (4 ** len(encoding) - 1) // 3 - key
+    return key if key <= mirror else mirror
+
+
+def pack_encoding(encoding):
+    # packed_key as bytes, padded to whole bytes.
+    key = packed_key(encoding)
+    pad = (-len(encoding)) % 4
+    return (key << (2 * pad)).to_bytes((len(encoding) + 3) // 4, 'big')
+
+
+def unpack_encoding(data, moves):
+    # Inverse of pack_encoding for an encoding of the given number of moves.
+    key = int.from_bytes(data, 'big') >> (2 * ((-moves) % 4))
+    return [((key >> (2 * (moves - 1 - i))) & 3) - 1 for i in range(moves)]
 
 
 class Conformation:
+    # Slotted to keep individuals small: no per-instance __dict__. The encoding is a
+    # signed-byte array; positions and the delta-evaluation state are shared between
+    # conformations and never modified in place, only rebound.
+    __slots__ = ('protein', 'setOfPoints', 'length', 'encoding', 'absPositions', 'fitness',
+                 'generation', 'validState', 'baseState', 'dirtyFrom')
+
     # Tracks total number of energy evaluations
     energyEvalSteps = 0
+    # Use the linear-time fused walk/validate/score kernel. Set to False to fall
+    # back to the original separate walks and pairwise scoring for cross-checking.
+    useFusedKernel = True
+    # Re-evaluate only the residues moved since the last scored walk (see delta_walk).
+    useDeltaEvaluation = True
+    # Optional FitnessCache consulted by evaluate() before walking the chain.
+    fitnessCache = None
+    # Key the fitness cache by canonical_key, so mirror images share one entry.
+    canonicalCacheKeys = False
 
     def __init__(self, protein = None, setOfPoints = None):
         self.protein = protein
@@ -22,16 +341,17 @@ class Conformation:
             self.length = 0
 
         # The encoding holds directions for positions 2..n, so there are length-2 entries.
-        if self.length >= 2:
-            self.encoding = [0] * (self.length - 2)
-        else:
-            self.encoding = []
+        self.encoding = array('b', bytes(max(self.length - 2, 0)))
 
         # Absolute positions for each residue (x, y).
         self.absPositions = [(0, 0)] * self.length
         self.fitness = 0
         self.generation = 0
         self.validState = False
+        # Last valid scored walk (positions, occupied, trace) and the first encoding
+        # index changed since; used for delta evaluation.
+        self.baseState = None
+        self.dirtyFrom = None
         
         # Generate initial conformation if both protein and collision set are provided
         if protein is not None and setOfPoints is not None:
@@ -45,7 +365,6 @@ class Conformation:
         new_conf.protein = p1.protein
         new_conf.length = p1.length
         new_conf.generation = (p1.generation + p2.generation) // 2 + 1
-        new_conf.encoding = [0] * (new_conf.length - 2)
         new_conf.absPositions = [(0, 0)] * new_conf.length
 
         if new_conf.length - 2 > 0:
@@ -53,16 +372,41 @@ class Conformation:
         else:
             randI = 0
 
-        # First part from p1, second from p2.
-        for i in range(0, randI):
-            new_conf.encoding[i] = p1.encoding[i]
-        for i in range(randI, new_conf.length - 2):
-            new_conf.encoding[i] = p2.encoding[i]
+        # First part from p1, second from p2, as two slice copies.
+        new_conf.encoding = array('b', p1.encoding[:randI])
+        new_conf.encoding.extend(p2.encoding[randI:])
+
+        # The prefix is p1's, so only the suffix after the cut point has to be re-walked.
+        new_conf.baseState = p1.baseState
+        new_conf.dirtyFrom = randI if p1.dirtyFrom is None else min(randI, p1.dirtyFrom)
 
         if new_conf.setOfPoints is not None:
-            new_conf.calculate_validity()
+            new_conf.evaluate(score=False)
+        return new_conf
+
+
+    def copy(self):
+        # Independent copy; only the encoding buffer is duplicated.
+        new_conf = Conformation()
+        new_conf.assign(self)
         return new_conf
 
+    def assign(self, other):
+        # Make this conformation equal to other. The encoding is copied into the
+        # existing buffer when the lengths match, so replacement allocates nothing.
+        if isinstance(self.encoding, array) and len(self.encoding) == len(other.encoding):
+            self.encoding[:] = other.encoding if isinstance(other.encoding, array) else array('b', other.encoding)
+        else:
+            self.encoding = array('b', other.encoding)
+        self.protein = other.protein
+        self.setOfPoints = other.setOfPoints
+        self.length = other.length
+        self.absPositions = other.absPositions
+        self.fitness = other.fitness
+        self.generation = other.generation
+        self.validState = other.validState
+        self.baseState = other.baseState
+        self.dirtyFrom = other.dirtyFrom
 
     def get_encoding(self):
         return self.encoding
@@ -79,6 +423,17 @@ class Conformation:
     def calculate_fitness(self):
         # Calculate energy (fitness) based on number of hydrophobic (B) contacts
         Conformation.energyEvalSteps += 1
+        if self.absPositions is None:
+            self.calculate_absolute_position()
+        if Conformation.useFusedKernel:
+            fitness = contact_energy(self.absPositions, self.protein.getHydrophobic())
+            if fitness is not None:
+                self.fitness = fitness
+                return
+        self.fitness = self.pairwise_energy()
+
+    def pairwise_energy(self):
+        # Reference O(n^2) scoring that checks every B-B pair.
         fitness = 0
         # For each amino acid, count hydrophobic contacts.
         for i in range(self.length):
@@ -91,11 +446,76 @@ class Conformation:
                         distY = abs(ori[1] - dest[1])
                         if (distX == 1 and distY == 0) or (distX == 0 and distY == 1):
                             fitness -= 1
-        self.fitness = fitness
+        return fitness
+
+    def evaluate(self, score=True, counter=None):
+        # Walk, validate and (optionally) score the conformation in a single pass.
+        # Only valid conformations are scored and counted as energy evaluations, in
+        # energyEvalSteps and in the evaluations attribute of counter if one is given
+        # (the Population the conformation belongs to).
+        cache = Conformation.fitnessCache
+        if not score or cache is None:
+            return self.evaluate_walk(score, counter)
+        # Keyed by sequence too: the cache is shared by every protein in the process
+        key = (self.protein.sequence,
+               canonical_key(self.encoding) if Conformation.canonicalCacheKeys else pack_encoding(self.encoding))
+        entry = cache.get(key)
+        if entry is None:
+            valid = self.evaluate_walk(score, counter)
+            cache.put(key, valid, self.fitness if valid else 0)
+            return valid
+        # Cache hit: not an energy evaluation. Positions are decoded again on demand.
+        self.validState, fitness = entry
+        if self.validState:
+            self.fitness = fitness
+        self.absPositions = None
+        return self.validState
+
+    def evaluate_walk(self, score=True, counter=None):
+        if not Conformation.useFusedKernel:
+            self.calculate_validity()
+            if score and self.validState:
+                self.calculate_fitness()
+                if counter is not None:
+                    counter.evaluations += 1
+            return self.validState
+        hydrophobic = self.protein.getHydrophobic()
+        if Conformation.useDeltaEvaluation and self.baseState is not None:
+            start = self.length if self.dirtyFrom is None else self.dirtyFrom + 2
+            valid, fitness, positions, occupied, trace = delta_walk(
+                self.encoding, hydrophobic, self.baseState, start, score)
+        else:
+            valid, fitness, positions, occupied, trace = fused_walk(
+                self.encoding, hydrophobic, score)
+        self.validState = valid
+        if not valid:
+            self.absPositions = positions + [None] * (self.length - len(positions))
+            return False
+        self.absPositions = positions
+        if score:
+            Conformation.energyEvalSteps += 1
+            if counter is not None:
+                counter.evaluations += 1
+            self.fitness = fitness
+            self.baseState = (positions, occupied, trace)
+            self.dirtyFrom = None
+        if self.setOfPoints is not None:
+            self.setOfPoints.clear()
+            self.setOfPoints.update(occupied)
+        return True
 
     def get_fitness(self):
         return self.fitness
 
+    def getPackedEncoding(self):
+        return pack_encoding(self.encoding)
+
+    def getPackedKey(self):
+        return packed_key(self.encoding)
+
+    def getCanonicalKey(self):
+        return canonical_key(self.encoding)
+
     def getConformationString(self):
         result = ""
         for d in self.encoding:
@@ -109,15 +529,41 @@ class Conformation:
                 result += "?"
         return result
 
+    def mark_dirty(self, i):
+        # Record that encoding index i changed since the last scored walk.
+        if self.dirtyFrom is None or i < self.dirtyFrom:
+            self.dirtyFrom = i
+
+    def repair(self, rand=random):
+        # Re-grow the suffix from the first collision (repair_walk); False if that failed.
+        encoding, start = repair_walk(self.encoding, rand)
+        if encoding is None:
+            return False
+        self.encoding = encoding
+        if start is not None:
+            self.mark_dirty(start)
+        return True
+
+    def generate_grown_conformation(self, rand=random):
+        # Valid random conformation built by grow_walk; returns its (deadEnds, restarts).
+        encoding, deadEnds, restarts = grow_walk(self.length, rand)
+        self.encoding = array('b', encoding)
+        self.baseState = None
+        self.dirtyFrom = None
+        self.evaluate(score=False)
+        return deadEnds, restarts
+
     def generate_random_conformation(self, valid: bool = False):
         # Initialize encoding with random directions.
         for i in range(self.length - 2):
             self.encoding[i] = random.randint(-1, 1)
+        self.baseState = None
+        self.dirtyFrom = None
         if valid:
-            self.calculate_validity()
+            self.evaluate(score=False)
             while not self.validState:
                 self.mutate(0.1)
-                self.calculate_validity()
+                self.evaluate(score=False)
 
     def calculate_validity(self):
         self.calculate_absolute_position()
@@ -133,15 +579,22 @@ class Conformation:
             self.setOfPoints.update(seen)
 
   
-    # randomly chooses one of three mutations.
-    def mutate(self, probability):
+    # randomly chooses one of three mutations and returns its name. An operator
+    # named in MUTATIONS (e.g. picked by OperatorSelector) is applied as given.
+    def mutate(self, probability, operator=None):
+        if operator is not None:
+            getattr(self, "mutate_" + operator)(probability)
+            return operator
         op_choice = random.random()
         if op_choice < 0.33:
             self.mutate_directed(probability)
+            return "directed"
         elif op_choice < 0.66:
             self.mutate_corner_flip(probability)
+            return "corner_flip"
         else:
             self.mutate_crankshaft(probability)
+            return "crankshaft"
 
     # 1. Directed local perturbation mutation.
     def mutate_directed(self, probability):
@@ -151,10 +604,10 @@ class Conformation:
                 # Choose a new value different from the current one.
                 alternatives = [d for d in [-1, 0, 1] if d != current]
                 self.encoding[i] = random.choice(alternatives)
+                self.mark_dirty(i)
 
     # 2. Corner flip mutation: flip a corner by inverting the turning move.
     def mutate_corner_flip(self, probability):
-        self.calculate_absolute_position()
         # Consider residues 1 through length-2 as potential corners.
         for i in range(1, self.length - 1):
             if self.randomFloat() <= probability and self.isCorner(i):
@@ -163,6 +616,7 @@ class Conformation:
                     self.encoding[i-1] = RIGHT
                 elif self.encoding[i-1] == RIGHT:
                     self.encoding[i-1] = LEFT
+                self.mark_dirty(i-1)
 
     # 3. Crankshaft mutation: rotate a short segment if the endpoints form a square.
     def mutate_crankshaft(self, probability):
@@ -199,65 +653,19 @@ class Conformation:
                 # Update the encoding for the affected segment.
                 self.encoding[i-1] = new_rel1
                 self.encoding[i] = new_rel2
+                self.mark_dirty(i-1)
 
-    # Helper: determine if residue at index i is a corner.
+    # Helper: determine if residue at index i is a corner. The bonds into and out of
+    # residue i differ exactly when the move placing residue i+1 is a turn, so no
+    # positions are needed.
     def isCorner(self, i):
-        self.calculate_absolute_position()
         if i <= 0 or i >= self.length - 1:
             return False
-        v1 = (self.absPositions[i][0] - self.absPositions[i-1][0],
-              self.absPositions[i][1] - self.absPositions[i-1][1])
-        v2 = (self.absPositions[i+1][0] - self.absPositions[i][0],
-              self.absPositions[i+1][1] - self.absPositions[i][1])
-        return v1 != v2
+        return self.encoding[i-1] != FORWARD
 
     # Compute absolute positions from the relative encoding.
     def calculate_absolute_position(self):
-        self.absPositions = [None] * self.length
-        x, y = 0, 0
-        self.absPositions[0] = (x, y)
-        y = 1
-        self.absPositions[1] = (x, y)
-        lastDirection = 0  # Starting "up" direction.
-        for i in range(self.length - 2):
-            d = self.encoding[i]
-            if lastDirection == 0:  # up
-                if d == FORWARD:
-                    y += 1
-                elif d == RIGHT:
-                    x += 1
-                    lastDirection = 2
-                elif d == LEFT:
-                    x -= 1
-                    lastDirection = 3
-            elif lastDirection == 1:  # down
-                if d == FORWARD:
-                    y -= 1
-                elif d == RIGHT:
-                    x -= 1
-                    lastDirection = 3
-                elif d == LEFT:
-                    x += 1
-                    lastDirection = 2
-            elif lastDirection == 2:  # right
-                if d == FORWARD:
-                    x += 1
-                elif d == RIGHT:
-                    y -= 1
-                    lastDirection = 1
-                elif d == LEFT:
-                    y += 1
-                    lastDirection = 0
-            elif lastDirection == 3:  # left
-                if d == FORWARD:
-                    x -= 1
-                elif d == RIGHT:
-                    y += 1
-                    lastDirection = 0
-                elif d == LEFT:
-                    y -= 1
-                    lastDirection = 1
-            self.absPositions[i + 2] = (x, y)
+        self.absPositions = decode_walk(self.encoding)
 
     # Helper: convert a move vector (dx, dy) to an absolute direction code.
     def absolute_direction(self, move):
@@ -296,6 +704,8 @@ class Conformation:
         return f"Fitness: {self.fitness}   Generation: {self.generation}"
 
     def printAsciiPicture(self):
+        if self.absPositions is None:
+            self.calculate_absolute_position()
         xs = [pos[0] for pos in self.absPositions]
         ys = [pos[1] for pos in self.absPositions]
         lowestX = min(xs)
@@ -339,4 +749,6 @@ class Conformation:
         return random.random()
 
     def getAbsAt(self, i):
+        if self.absPositions is None:
+            self.calculate_absolute_position()
         return self.absPositions[i]
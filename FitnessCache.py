@@ -0,0 +1,41 @@
+from collections import OrderedDict
+
+
+class FitnessCache:
+    # Bounded LRU map from a (protein sequence, packed encoding) key (see
+    # Conformation.evaluate) to its (validity, fitness). Hits and misses are counted here and not in
+    # Conformation.energyEvalSteps, so cached lookups are reported separately from
+    # real energy evaluations.
+    def __init__(self, maxSize: int):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, valid: bool, fitness: int):
+        self.entries[key] = (valid, fitness)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxSize:
+            # Evict the least recently used entry
+            self.entries.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
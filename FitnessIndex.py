@@ -0,0 +1,126 @@
+import bisect
+import math
+import random
+
+
+class FitnessIndex:
+    # Individuals ordered by fitness, best first, in one list where every fitness
+    # level is a contiguous block (start, count). The individual at any rank is a
+    # list lookup, so selection costs O(1) however large the population is; moving
+    # an individual to another level swaps it across the blocks in between, so an
+    # update costs O(levels crossed). Energies are small integers, so there are few
+    # levels.
+    def __init__(self, individuals):
+        self.ranked = sorted(individuals, key=lambda indiv: indiv.get_fitness())
+        self.rankOf = {id(indiv): r for r, indiv in enumerate(self.ranked)}
+        self.start = {}
+        self.count = {}
+        for r, indiv in enumerate(self.ranked):
+            fitness = indiv.get_fitness()
+            if fitness not in self.count:
+                self.start[fitness] = r
+                self.count[fitness] = 0
+            self.count[fitness] += 1
+        self.levels = sorted(self.count)
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def best(self):
+        return self.ranked[0]
+
+    def worst(self):
+        return self.ranked[-1]
+
+    def swap(self, r1, r2):
+        a = self.ranked[r1]
+        b = self.ranked[r2]
+        self.ranked[r1] = b
+        self.ranked[r2] = a
+        self.rankOf[id(a)] = r2
+        self.rankOf[id(b)] = r1
+
+    def update(self, indiv, oldFitness):
+        # Move an indexed individual whose fitness changed from oldFitness.
+        fitness = indiv.get_fitness()
+        if fitness == oldFitness:
+            return
+        r = self.rankOf[id(indiv)]
+        levels = self.levels
+        if fitness < oldFitness:
+            # To the front of its block, then over every block better than oldFitness
+            # and worse than fitness; each of those shifts one place towards the back.
+            first = self.start[oldFitness]
+            self.swap(r, first)
+            self.start[oldFitness] = first + 1
+            r = first
+            i = bisect.bisect_left(levels, oldFitness) - 1
+            while i >= 0 and levels[i] > fitness:
+                first = self.start[levels[i]]
+                self.swap(r, first)
+                self.start[levels[i]] = first + 1
+                r = first
+                i -= 1
+            if fitness not in self.count:
+                self.start[fitness] = r
+                self.count[fitness] = 0
+                bisect.insort(levels, fitness)
+        else:
+            # The mirror image: to the back of its block, then over the worse blocks.
+            last = self.start[oldFitness] + self.count[oldFitness] - 1
+            self.swap(r, last)
+            r = last
+            i = bisect.bisect_right(levels, oldFitness)
+            while i < len(levels) and levels[i] < fitness:
+                last = self.start[levels[i]] + self.count[levels[i]] - 1
+                self.swap(r, last)
+                self.start[levels[i]] -= 1
+                r = last
+                i += 1
+            if fitness not in self.count:
+                self.start[fitness] = r + 1
+                self.count[fitness] = 0
+                bisect.insort(levels, fitness)
+            self.start[fitness] -= 1
+        self.count[fitness] += 1
+        self.count[oldFitness] -= 1
+        if self.count[oldFitness] == 0:
+            del self.start[oldFitness]
+            del self.count[oldFitness]
+            levels.remove(oldFitness)
+
+    def pick(self, r, rand=random):
+        # A uniformly random individual of the fitness level at rank r
+        fitness = self.ranked[r].get_fitness()
+        return self.ranked[self.start[fitness] + int(rand.random() * self.count[fitness])]
+
+    def tournament(self, size, rand=random):
+        # Same distribution as the fittest of `size` distinct random individuals, ties
+        # broken at random: the best of `size` distinct random ranks picks the level.
+        n = len(self.ranked)
+        if size > n:
+            # As random.sample, which tournament selection drew with before
+            raise ValueError("Sample larger than population or is negative")
+        drawn = set()
+        while len(drawn) < size:
+            drawn.add(int(rand.random() * n))
+        return self.pick(min(drawn), rand)
+
+    def rank(self, rand=random):
+        # Linear ranking: the chance of rank r falls linearly from best to worst.
+        n = len(self.ranked)
+        return self.pick(min(int(n * (1 - math.sqrt(1 - rand.random()))), n - 1), rand)
+
+    def roulette(self, rand=random):
+        # Fitness-proportionate selection on the number of contacts (-fitness), one
+        # weight per level.
+        weighted = [fitness for fitness in self.levels if fitness < 0]
+        total = sum(-fitness * self.count[fitness] for fitness in weighted)
+        if total == 0:
+            return self.ranked[rand.randrange(len(self.ranked))]
+        x = rand.random() * total
+        for fitness in weighted:
+            x += fitness * self.count[fitness]
+            if x < 0:
+                break
+        return self.ranked[self.start[fitness] + rand.randrange(self.count[fitness])]
@@ -0,0 +1,128 @@
+import random
+
+from Conformation import Conformation, NEIGHBOURS, encode_positions
+
+
+def pull_move(positions, occupied, i, toward, side):
+    # Pull move of residue i (Lesh et al.): i moves to the free site L next to its
+    # neighbour i + toward, on the given side of the bond, and the residues behind it
+    # (i - toward, i - 2 * toward, ...) follow two sites up the chain until the
+    # chain is connected again. Returns the moves as (residue, new site) pairs, or
+    # None if the move is not possible.
+    n = len(positions)
+    anchor = i + toward
+    if anchor < 0 or anchor >= n:
+        return None
+    ax, ay = positions[i]
+    bx, by = positions[anchor]
+    # Unit vector perpendicular to the bond i -> anchor.
+    vx, vy = side * (by - ay), side * (ax - bx)
+    site = (bx + vx, by + vy)
+    if site in occupied:
+        return None
+    moves = [(i, site)]
+    behind = i - toward
+    if behind < 0 or behind >= n:
+        return moves  # end move
+    corner = (ax + vx, ay + vy)
+    if corner == positions[behind]:
+        return moves  # corner flip
+    if corner in occupied:
+        return None
+    moves.append((behind, corner))
+    lx, ly = corner
+    j = behind - toward
+    while 0 <= j < n:
+        x, y = positions[j]
+        if abs(x - lx) + abs(y - ly) == 1:
+            break
+        lx, ly = positions[j + 2 * toward]
+        moves.append((j, (lx, ly)))
+        j -= toward
+    return moves
+
+
+def apply_moves(positions, occupied, moves):
+    # Moves residues in place and returns the moves that undo it.
+    undo = [(k, positions[k]) for k, _ in moves]
+    for k, _ in moves:
+        del occupied[positions[k]]
+    for k, site in moves:
+        positions[k] = site
+        occupied[site] = k
+    return undo
+
+
+def moved_contacts(positions, occupied, moves, hydrophobic):
+    # H-H contacts touching at least one moved residue, each counted once.
+    moved = {k for k, _ in moves}
+    contacts = 0
+    for k, _ in moves:
+        if hydrophobic[k]:
+            x, y = positions[k]
+            for nx, ny in NEIGHBOURS:
+                j = occupied.get((x + nx, y + ny))
+                if j is not None and hydrophobic[j] and abs(j - k) > 1 and (j > k or j not in moved):
+                    contacts += 1
+    return contacts
+
+
+class LocalSearch:
+    # Bounded first-improvement hill climbing over the pull-move neighbourhood.
+    # Every neighbour is scored incrementally from the contacts of the residues it
+    # moves; each scored neighbour counts as one energy evaluation, in
+    # Conformation.energyEvalSteps as well as in this search's own counters.
+    def __init__(self, budget, rand=random):
+        self.budget = budget
+        self.rand = rand
+        self.calls = 0
+        self.evaluations = 0
+        self.improvements = 0
+
+    def run(self, conf):
+        # Improves a valid, scored conformation in place within budget evaluations.
+        # Returns the energy gained (<= 0).
+        if conf.absPositions is None:
+            conf.calculate_absolute_position()
+        hydrophobic = conf.protein.getHydrophobic()
+        positions = list(conf.absPositions)
+        occupied = {pos: k for k, pos in enumerate(positions)}
+        candidates = [(i, toward, side) for i in range(len(positions))
+                      for toward in (1, -1) for side in (1, -1)]
+        fitness = conf.fitness
+        evaluations = 0
+        improved = True
+        while improved and evaluations < self.budget:
+            improved = False
+            self.rand.shuffle(candidates)
+            for i, toward, side in candidates:
+                moves = pull_move(positions, occupied, i, toward, side)
+                # Moves of polar residues only cannot change the energy.
+                if moves is None or not any(hydrophobic[k] for k, _ in moves):
+                    continue
+                evaluations += 1
+                lost = moved_contacts(positions, occupied, moves, hydrophobic)
+                undo = apply_moves(positions, occupied, moves)
+                delta = lost - moved_contacts(positions, occupied, moves, hydrophobic)
+                if delta < 0:
+                    fitness += delta
+                    improved = True
+                    self.improvements += 1
+                    break
+                apply_moves(positions, occupied, undo)
+                if evaluations >= self.budget:
+                    break
+
+        self.calls += 1
+        self.evaluations += evaluations
+        Conformation.energyEvalSteps += evaluations
+        gain = fitness - conf.fitness
+        if gain < 0:
+            # The walk may have moved off the origin, so positions are decoded again
+            # from the new encoding (no energy evaluation).
+            conf.encoding = encode_positions(positions)
+            conf.fitness = fitness
+            conf.calculate_absolute_position()
+            conf.baseState = None
+            conf.dirtyFrom = None
+        return gain
@@ -0,0 +1,67 @@
+import time
+
+# Outcomes counted for every child, per mutation operator. A repaired child is
+# counted as invalid and repaired, then by what became of it.
+OUTCOMES = ("invalid", "repaired", "duplicate", "rejected", "accepted", "improving")
+
+
+class NoMetrics:
+    # Stand-in for Metrics while metrics are switched off: every hook does nothing,
+    # so the evolution loop calls them unconditionally.
+    def restart(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def count(self, operator, outcome):
+        pass
+
+    def snapshot(self):
+        return None
+
+
+NO_METRICS = NoMetrics()
+
+
+class Metrics:
+    # Counters and cumulative per-phase timers for the evolution loop, switched on
+    # by Population.enable_metrics. Phases are timed as laps: lap(phase) charges the
+    # time since the previous lap (or restart) to phase. Evaluations are read from
+    # the population's own counter, so populations sharing a process don't mix.
+    def __init__(self, pop):
+        self.pop = pop
+        self.operators = {}
+        self.phaseSeconds = {}
+        self.startTime = time.perf_counter()
+        self.lapTime = self.startTime
+        self.startEvaluations = pop.evaluations
+
+    def restart(self):
+        self.lapTime = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phaseSeconds[phase] = self.phaseSeconds.get(phase, 0.0) + now - self.lapTime
+        self.lapTime = now
+
+    def count(self, operator, outcome):
+        counts = self.operators.get(operator)
+        if counts is None:
+            counts = self.operators[operator] = dict.fromkeys(OUTCOMES, 0)
+        counts[outcome] += 1
+
+    def add_time(self, phase, seconds):
+        self.phaseSeconds[phase] = self.phaseSeconds.get(phase, 0.0) + seconds
+
+    def snapshot(self):
+        # Plain dict of everything recorded so far, safe to log or serialize
+        elapsed = time.perf_counter() - self.startTime
+        evaluations = self.pop.evaluations - self.startEvaluations
+        return {
+            "operators": {op: dict(counts) for op, counts in self.operators.items()},
+            "phaseSeconds": dict(self.phaseSeconds),
+            "evaluations": evaluations,
+            "elapsedSeconds": elapsed,
+            "evaluationsPerSecond": evaluations / elapsed if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,66 @@
+import random
+
+from Conformation import MUTATIONS
+
+# Reward of each child outcome: only children that replace a parent earn credit.
+# "unchanged" stands for any outcome of a child the operator did not change, whose
+# fate is down to crossover alone.
+REWARDS = {"unchanged": 0.0, "invalid": 0.0, "duplicate": 0.0, "rejected": 0.0, "accepted": 1.0}
+
+
+class AdaptiveOperators:
+    # Adaptive choice of the mutation operator by probability matching (Thierens,
+    # 2005). Every operator keeps a quality estimate, an exponential moving average
+    # (rate adaptationRate) of the rewards of the children it mutated, and is chosen
+    # with probability minProbability + (1 - k * minProbability) * quality / total
+    # quality. Qualities start at 0, so the choice is uniform until a child is
+    # accepted; an operator that never pays off sinks to minProbability. The floor
+    # keeps every operator in use, so one that starts paying off later in the run is
+    # noticed.
+    def __init__(self, operators=MUTATIONS, adaptationRate=0.1, minProbability=0.1, rand=random):
+        self.operators = tuple(operators)
+        self.adaptationRate = adaptationRate
+        self.minProbability = minProbability
+        self.rand = rand
+        self.quality = dict.fromkeys(self.operators, 0.0)
+        # Children per operator: mutated, then of those it changed the valid, new to the
+        # population and accepted ones
+        self.uses = dict.fromkeys(self.operators, 0)
+        self.valid = dict.fromkeys(self.operators, 0)
+        self.new = dict.fromkeys(self.operators, 0)
+        self.accepted = dict.fromkeys(self.operators, 0)
+        self.probabilities = self.matched_probabilities()
+
+    def matched_probabilities(self):
+        total = sum(self.quality.values())
+        k = len(self.operators)
+        if total <= 0:
+            return {op: 1.0 / k for op in self.operators}
+        share = 1.0 - k * self.minProbability
+        return {op: self.minProbability + share * self.quality[op] / total for op in self.operators}
+
+    def choose(self):
+        x = self.rand.random()
+        for op in self.operators:
+            x -= self.probabilities[op]
+            if x < 0:
+                return op
+        return self.operators[-1]
+
+    def update(self, operator, outcome):
+        # Credit operator with the outcome of a child it mutated (see REWARDS).
+        self.uses[operator] += 1
+        if outcome not in ("unchanged", "invalid"):
+            self.valid[operator] += 1
+            if outcome != "duplicate":
+                self.new[operator] += 1
+                if outcome == "accepted":
+                    self.accepted[operator] += 1
+        self.quality[operator] += self.adaptationRate * (REWARDS[outcome] - self.quality[operator])
+        self.probabilities = self.matched_probabilities()
+
+    def credit(self):
+        # Current selection probability, quality and outcome counts of every operator
+        return {op: {"probability": self.probabilities[op], "quality": self.quality[op], "uses": self.uses[op],
+                     "valid": self.valid[op], "new": self.new[op], "accepted": self.accepted[op]}
+                for op in self.operators}
@@ -1,10 +1,40 @@
 import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from typing import Set
 
-from Conformation import Conformation, Protein
+from Conformation import Conformation, Protein, grow_walk, pack_encoding, unpack_encoding
+from BloomFilter import BloomFilter
+from FitnessIndex import FitnessIndex
+from LocalSearch import LocalSearch
+from Metrics import Metrics, NO_METRICS
+from OperatorSelector import AdaptiveOperators
+from SharedEvaluator import SharedEvaluator
+
+
+def grow_batch(length, count, seed):
+    # Worker task for parallel initialization: count grown walks as packed encodings,
+    # plus the dead ends and restarts it took to grow them.
+    rand = random.Random(seed)
+    walks = []
+    deadEnds = 0
+    restarts = 0
+    for _ in range(count):
+        encoding, stuck, restarted = grow_walk(length, rand)
+        walks.append(pack_encoding(encoding))
+        deadEnds += stuck
+        restarts += restarted
+    return walks, deadEnds, restarts
+
+
+# Parent selection methods (Population selection=...), all served by the FitnessIndex
+SELECTIONS = ("tournament", "rank", "roulette")
+
 
 class Population:
-    def __init__(self, size, prot, mutProb, crossProb):
+    def __init__(self, size, prot, mutProb, crossProb, historyBits=0, initMethod="grow", workers=1,
+                 canonicalKeys=False, localSearchBudget=0, selection="tournament", repairCollisions=False,
+                 evalWorkers=0, adaptiveOperators=False):
         # Conformation of parents used during crossover
         self.parent1 = None
         self.parent2 = None
@@ -15,97 +45,399 @@ class Population:
 
         # This set is passed to Conformation for collision checking
         self.collisionSet: Set = set()
-        # To track already encountered conformations to ensure theyre unique
+        # Packed keys (Conformation.getPackedKey) of the current individuals, to keep them unique
         self.setOfConformations = set()
+        # Key conformations by Conformation.getCanonicalKey so mirror images count as duplicates.
+        # Children already in the population are then skipped before evaluation: duplicateSkips
+        # counts exact copies, symmetrySkips the ones that were only mirror images.
+        self.canonicalKeys = canonicalKeys
+        self.duplicateSkips = 0
+        self.symmetrySkips = 0
+        # Optional pull-move hill climbing run on promising children before they are inserted,
+        # limited to localSearchBudget energy evaluations per child
+        self.localSearch = LocalSearch(localSearchBudget) if localSearchBudget > 0 else None
+        # Re-grow children that collide after mutation from their first collision
+        # (Conformation.repair) instead of discarding them. repairAttempts counts the
+        # colliding children, repairSaved those that came out valid.
+        self.repairCollisions = repairCollisions
+        self.repairAttempts = 0
+        self.repairSaved = 0
+        # Optional adaptive choice of the mutation operator, credited with the outcome of
+        # every child; None keeps Conformation.mutate's fixed odds
+        self.operators = AdaptiveOperators() if adaptiveOperators else None
+        # Optional pool of evalWorkers processes that scores the children of crossover_batch
+        # in shared memory; close() stops it
+        self.evaluator = SharedEvaluator(prot, evalWorkers) if evalWorkers > 0 else None
+        # Optional fixed-memory filter of every conformation ever offered for insertion
+        self.historyFilter = BloomFilter(historyBits) if historyBits > 0 else None
+        # Conformations inserted so far, including the initial ones
+        self.insertedCount = 0
+        # Children produced by crossover so far, whether inserted or not
+        self.offspringCount = 0
+        # Of those, the children that replaced a parent and the ones that did not
+        # (duplicate, invalid or not fitter); immigrants are not counted
+        self.acceptedCount = 0
+        self.rejectedCount = 0
+        # Energy evaluations spent on this population, initialization included. Unlike
+        # Conformation.energyEvalSteps it only counts this population's, so Runner can
+        # budget runs that share a process.
+        self.evaluations = 0
         # List to hold all individuals (Conformation objects)
         self.individuals = []
+        # Hot-path counters and timers (Metrics) while enable_metrics() is in effect,
+        # else a stand-in whose hooks do nothing
+        self.metrics = NO_METRICS
+        # Initialization attempts thrown away (zero fitness, duplicate or abandoned growth) and dead ends backtracked
+        self.initRejected = 0
+        self.initDeadEnds = 0
+        self.theFittest = None
+        # Individuals ranked by fitness, kept up to date by replace(); parents are drawn from it
+        self.fitnessIndex = None
+        if selection not in SELECTIONS:
+            raise ValueError("Unknown selection method: " + str(selection))
+        self.selection = selection
+        self.select = getattr(self, selection + "_select")
 
+        # initMethod=None leaves the population empty, to be filled from a checkpoint (Checkpoint.py)
+        if initMethod is not None:
+            self.generate(initMethod, workers)
+
+    def generate(self, initMethod, workers):
         print("Generate Population:")
         i = 0
         # Keep generating until the population is filled
-        while i < self.size:
-            # Create a temporary conformation(Conformation's constructor generates a random valid conformation when passed protein and collision set)
-            temp = Conformation(self.protein, self.collisionSet)
-            temp.calculate_fitness()
+        candidates = self.initial_candidates(initMethod, workers)
+        for temp in candidates:
+            temp.evaluate(counter=self)
             # Only insert if fitness is not zero and is unique
-            if temp.get_fitness() != 0 and temp.getConformationString() not in self.setOfConformations:
+            if temp.get_fitness() != 0 and self.is_insertable(temp):
                 self.individuals.append(temp)
-                self.setOfConformations.add(temp.getConformationString())
+                self.setOfConformations.add(self.key_of(temp))
+                self.insertedCount += 1
                 print(f"{i}.", end="", flush=True)
                 i += 1
+                if i == self.size:
+                    break
+            else:
+                self.initRejected += 1
+        candidates.close()
 
+        self.fitnessIndex = FitnessIndex(self.individuals)
         # Initialize the fittest individual as the first one and then update
         self.theFittest = self.individuals[0]
         self.set_fittest()
         print()
+        print(f"Rejected {self.initRejected} attempts, backtracked {self.initDeadEnds} dead ends")
 
-    def is_insertable(self, candidate):
-        # Check if a conformation is new to the population
-        confStr = candidate.getConformationString()
-        if confStr not in self.setOfConformations:
-            self.setOfConformations.add(confStr)
-            return True
+    def initial_candidates(self, initMethod, workers):
+        # Endless stream of valid random conformations to fill the population from.
+        # "random" repairs random turns by mutation until the walk is valid (Conformation's
+        # constructor); "grow" builds self-avoiding walks directly with grow_walk, in
+        # worker processes when workers > 1.
+        if initMethod == "random":
+            while True:
+                yield Conformation(self.protein, self.collisionSet)
+        if initMethod != "grow":
+            raise ValueError("Unknown initialization method: " + str(initMethod))
+        if workers <= 1:
+            while True:
+                temp = Conformation(self.protein)
+                temp.setOfPoints = self.collisionSet
+                deadEnds, restarts = temp.generate_grown_conformation()
+                self.initDeadEnds += deadEnds
+                self.initRejected += restarts
+                yield temp
+        length = self.protein.getLength()
+        chunk = max(1, self.size // workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                seeds = [random.getrandbits(64) for _ in range(workers)]
+                for walks, deadEnds, restarts in executor.map(grow_batch, [length] * workers, [chunk] * workers, seeds):
+                    self.initDeadEnds += deadEnds
+                    self.initRejected += restarts
+                    for data in walks:
+                        temp = Conformation(self.protein)
+                        temp.setOfPoints = self.collisionSet
+                        temp.encoding = array('b', unpack_encoding(data, length - 2))
+                        yield temp
+
+    def key_of(self, conf):
+        return conf.getCanonicalKey() if self.canonicalKeys else conf.getPackedKey()
+
+    def is_known(self, candidate):
+        # With canonical keys: is the candidate (or its mirror image) already in the population?
+        if not self.canonicalKeys or candidate.getCanonicalKey() not in self.setOfConformations:
+            return False
+        if candidate.getPackedKey() in self.setOfConformations:
+            self.duplicateSkips += 1
+        else:
+            self.symmetrySkips += 1
+        return True
+
+    def evaluate_child(self, child, operator=None):
+        # Evaluate a child, repairing it first if it collides and repair is switched on
+        valid = child.evaluate(counter=self)
+        self.metrics.lap("evaluate")
+        return valid or self.repair_child(child, operator)
+
+    def repair_child(self, child, operator=None):
+        # Re-grow a colliding child if repair is switched on; True if it came out valid
+        if not self.repairCollisions:
+            return False
+        self.repairAttempts += 1
+        repaired = child.repair() and child.evaluate(counter=self)
+        self.metrics.lap("repair")
+        if repaired:
+            self.repairSaved += 1
+            self.metrics.count(operator, "invalid")
+            self.metrics.count(operator, "repaired")
+        return repaired
+
+    def repaired_fraction(self):
+        # Share of all children produced so far that were saved by repair
+        return self.repairSaved / self.offspringCount if self.offspringCount else 0.0
+
+    def mutate_child(self, child):
+        # Mutate a child with an operator picked by the adaptive selector (or at fixed odds).
+        # Returns (operator's name, whether it changed the child); the change is only
+        # checked with the selector, which credits an unchanged child with nothing.
+        if self.operators is None:
+            operator = child.mutate(self.mutProb)
+            changed = True
+        else:
+            before = child.encoding.tobytes()
+            operator = child.mutate(self.mutProb, self.operators.choose())
+            changed = child.encoding.tobytes() != before
+        self.metrics.lap("mutate")
+        return operator, changed
+
+    def offer(self, child, first, second, operator=None, changed=True):
+        # Evaluate a child mutated by operator and let it replace the weaker of its
+        # parents if it is fitter. Returns the outcome: "duplicate", "invalid",
+        # "rejected" or "accepted".
+        if self.is_known(child):
+            outcome = "duplicate"
+        elif not self.evaluate_child(child, operator):
+            outcome = "invalid"
+        else:
+            return self.insert(child, first, second, operator, changed)
+        self.credit(operator, outcome, changed)
+        return outcome
+
+    def insert(self, child, first, second, operator=None, changed=True):
+        # The part of offer() after a valid evaluation
+        self.polish(child)
+        insertable = self.is_insertable(child)
+        self.metrics.lap("dedup")
+        # Best fitness before replace(), which may overwrite the current best in place
+        best = self.theFittest.get_fitness()
+        if not insertable:
+            outcome = "duplicate"
+        elif child.get_fitness() < first.get_fitness():
+            self.replace(first, child)
+            outcome = "accepted"
+        elif child.get_fitness() < second.get_fitness():
+            self.replace(second, child)
+            outcome = "accepted"
         else:
+            outcome = "rejected"
+        self.credit(operator, outcome, changed)
+        if outcome == "accepted" and child.get_fitness() < best:
+            self.metrics.count(operator, "improving")
+        return outcome
+
+    def credit(self, operator, outcome, changed=True):
+        # Report the final outcome of a child to the counters, metrics and operator selector
+        if outcome == "accepted":
+            self.acceptedCount += 1
+        else:
+            self.rejectedCount += 1
+        self.metrics.count(operator, outcome)
+        if self.operators is not None:
+            self.operators.update(operator, outcome if changed else "unchanged")
+
+    def polish(self, child):
+        # Local search on children at least as fit as the weaker parent
+        if self.localSearch is None:
+            return
+        if child.get_fitness() <= max(self.parent1.get_fitness(), self.parent2.get_fitness()):
+            before = self.localSearch.evaluations
+            self.localSearch.run(child)
+            self.evaluations += self.localSearch.evaluations - before
+        self.metrics.lap("local_search")
+
+    def is_insertable(self, candidate):
+        # Check if a conformation is new to the population (and, with a history filter, was never offered before)
+        key = self.key_of(candidate)
+        if key in self.setOfConformations:
             return False
+        if self.historyFilter is not None:
+            if key in self.historyFilter:
+                return False
+            self.historyFilter.add(key)
+        return True
+
+    def replace(self, indiv, candidate):
+        # Overwrite an individual in place and move its entry in the dedup index
+        self.setOfConformations.discard(self.key_of(indiv))
+        oldFitness = indiv.get_fitness()
+        indiv.assign(candidate)
+        self.setOfConformations.add(self.key_of(indiv))
+        self.fitnessIndex.update(indiv, oldFitness)
+        self.insertedCount += 1
+
+    def history_false_positive_rate(self):
+        # Estimated chance that the history filter rejects a conformation it never saw
+        if self.historyFilter is None:
+            return 0.0
+        return self.historyFilter.false_positive_rate()
 
     def set_fittest(self):
         # Identifies the individual with the lowest energy (best fitness)
-        for indiv in self.individuals:
-            if indiv.get_fitness() < self.theFittest.get_fitness():
-                self.theFittest = indiv
+        best = self.fitnessIndex.best()
+        if best.get_fitness() < self.theFittest.get_fitness():
+            self.theFittest = best
 
     def get_fittest(self):
         return self.theFittest
 
+    def get_best(self, count):
+        # The count fittest individuals, best first
+        return self.fitnessIndex.ranked[:count]
+
+    def add_immigrant(self, immigrant):
+        # Replace the least fit individual with an immigrant from another population if it is fitter and new
+        worst = self.fitnessIndex.worst()
+        if immigrant.get_fitness() >= worst.get_fitness() or not self.is_insertable(immigrant):
+            return False
+        self.replace(worst, immigrant)
+        if worst.get_fitness() < self.theFittest.get_fitness():
+            self.theFittest = worst
+        return True
+
 
     # New tournament selection method
     def tournament_select(self, tournament_size: int = 3) -> Conformation:
-        # Randomly select a subset of individuals
-        participants = random.sample(self.individuals, tournament_size)
-        # For protein folding, a lower fitness (more negative energy) is better.
-        best = min(participants, key=lambda indiv: indiv.get_fitness())
-        return best
+        # The fittest of tournament_size random individuals (lower energy is better),
+        # drawn in constant time from the fitness index
+        return self.fitnessIndex.tournament(tournament_size)
+
+    def rank_select(self) -> Conformation:
+        return self.fitnessIndex.rank()
+
+    def roulette_select(self) -> Conformation:
+        return self.fitnessIndex.roulette()
 
     # Updated crossover method to use tournament selection
     def crossover(self):
-        # Select parents using tournament selection instead of roulette wheel selection.
-        self.parent1 = self.tournament_select()
+        # Select parents using tournament selection (or the rank/roulette methods chosen by selection).
+        self.metrics.restart()
+        self.parent1 = self.select()
+        self.metrics.lap("select")
         if self.crossProb < random.random():
             return  # skip crossover based on probability
 
-        self.parent2 = self.tournament_select()
+        self.parent2 = self.select()
+        self.metrics.lap("select")
         if self.crossProb < random.random():
             return  # skip crossover based on probability
 
         # Create two children via crossover (recombination).
         child1 = Conformation.crossover(self.parent1, self.parent2, self.collisionSet)
         child2 = Conformation.crossover(self.parent2, self.parent1, self.collisionSet)
+        self.offspringCount += 2
+        self.metrics.lap("crossover")
 
-        # Mutate child1, recalc validity and fitness.
-        child1.mutate(self.mutProb)
-        child1.calculate_validity()
-        if child1.isValid():
-            child1.calculate_fitness()
-            if self.is_insertable(child1):
-                # Replace the less fit parent with child1 if fitter.
-                if child1.get_fitness() < self.parent1.get_fitness():
-                    self.parent1.__dict__.update(child1.__dict__)
-                elif child1.get_fitness() < self.parent2.get_fitness():
-                    self.parent2.__dict__.update(child1.__dict__)
+        # Mutate child1, recalc validity and fitness; replace the less fit parent with child1 if fitter.
+        self.offer(child1, self.parent1, self.parent2, *self.mutate_child(child1))
 
         # Mutate child2, recalc validity and fitness.
-        child2.mutate(self.mutProb)
-        child2.calculate_validity()
-        if child2.isValid():
-            child2.calculate_fitness()
-            if self.is_insertable(child2):
-                if child2.get_fitness() < self.parent2.get_fitness():
-                    self.parent2.__dict__.update(child2.__dict__)
-                elif child2.get_fitness() < self.parent1.get_fitness():
-                    self.parent1.__dict__.update(child2.__dict__)
+        self.offer(child2, self.parent2, self.parent1, *self.mutate_child(child2))
 
         # Update the fittest individual if any parent improved.
         if self.parent1.get_fitness() < self.theFittest.get_fitness():
             self.theFittest = self.parent1
         if self.parent2.get_fitness() < self.theFittest.get_fitness():
-            self.theFittest = self.parent2
\ No newline at end of file
+            self.theFittest = self.parent2
+
+    def crossover_batch(self, batchSize):
+        # batchSize crossover() steps whose children are evaluated together, by the
+        # shared-memory evaluator if there is one. Parents are drawn from the
+        # population as it was before the batch; replacement then walks the pairs in
+        # order with the same rules as crossover(), so a parent replaced earlier in
+        # the batch is compared at its new fitness.
+        pairs = []
+        self.metrics.restart()
+        for _ in range(batchSize):
+            parent1 = self.select()
+            self.metrics.lap("select")
+            if self.crossProb < random.random():
+                continue
+            parent2 = self.select()
+            self.metrics.lap("select")
+            if self.crossProb < random.random():
+                continue
+            children = []
+            for first, second in ((parent1, parent2), (parent2, parent1)):
+                # No collision set: the walk is left to the evaluator
+                child = Conformation.crossover(first, second)
+                child.setOfPoints = self.collisionSet
+                self.metrics.lap("crossover")
+                operator, changed = self.mutate_child(child)
+                children.append((None if self.is_known(child) else child, operator, changed))
+            pairs.append((parent1, parent2, children))
+        self.offspringCount += 2 * len(pairs)
+        if not pairs:
+            return
+
+        pending = [(child, operator) for _, _, children in pairs for child, operator, _ in children if child is not None]
+        self.metrics.restart()
+        if self.evaluator is not None:
+            valid, fitness = self.evaluator.evaluate([child.encoding for child, _ in pending])
+            self.metrics.lap("evaluate")
+            for (child, _), ok, energy in zip(pending, valid, fitness):
+                # Positions are decoded again on demand, as after a fitness cache hit
+                child.validState = ok
+                child.fitness = energy if ok else 0
+                child.absPositions = None
+                child.baseState = None
+                child.dirtyFrom = None
+            Conformation.energyEvalSteps += sum(valid)
+            self.evaluations += sum(valid)
+            for child, operator in pending:
+                if not child.validState:
+                    self.repair_child(child, operator)
+        else:
+            for child, operator in pending:
+                self.evaluate_child(child, operator)
+
+        for parent1, parent2, children in pairs:
+            for (child, operator, changed), first, second in zip(children, (parent1, parent2), (parent2, parent1)):
+                if child is None:
+                    self.credit(operator, "duplicate", changed)
+                elif not child.validState:
+                    self.credit(operator, "invalid", changed)
+                else:
+                    self.parent1, self.parent2 = parent1, parent2
+                    self.insert(child, first, second, operator, changed)
+            for parent in (parent1, parent2):
+                if parent.get_fitness() < self.theFittest.get_fitness():
+                    self.theFittest = parent
+        self.parent1, self.parent2 = pairs[-1][0], pairs[-1][1]
+
+    def close(self):
+        # Stop the evaluation workers, if any
+        if self.evaluator is not None:
+            self.evaluator.close()
+            self.evaluator = None
+
+    def enable_metrics(self):
+        # Start collecting metrics; until this is called the hooks in crossover() and
+        # the offer path do nothing.
+        self.metrics = Metrics(self)
+
+    def disable_metrics(self):
+        self.metrics = NO_METRICS
+
+    def metrics_snapshot(self):
+        return self.metrics.snapshot()
@@ -1,9 +1,14 @@
 class Protein:
     def __init__(self, sequence: str):
         self.sequence = sequence
+        # Hydrophobic ('B') flag per residue, used by the contact lookups.
+        self.hydrophobic = tuple(acid == 'B' for acid in sequence)
 
     def getNth(self, i: int) -> str:
         return self.sequence[i]
 
     def getLength(self) -> int:
-        return len(self.sequence)
\ No newline at end of file
+        return len(self.sequence)
+
+    def getHydrophobic(self) -> tuple:
+        return self.hydrophobic
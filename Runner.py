@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import namedtuple
+
+# A new best fold found during a run; conformation is a copy, safe to keep.
+Improvement = namedtuple("Improvement", "fitness evaluations generation seconds conformation")
+# Outcome of a run. reason is why it stopped: "bound" (the lower bound was reached,
+# so the fold is optimal), "optimum" (minEnergy reached), "evaluations" (budget used
+# up), "deadline" or "cancelled". gap is fitness - bound, None without a bound.
+RunResult = namedtuple("RunResult", "best fitness evaluations generations evaluationsToBest "
+                                    "generationsToBest birthGeneration seconds reason bound gap")
+
+
+class Runner:
+    # Evolves a Population (or ArrayPopulation) until it reaches minEnergy or the
+    # provable lower bound (Bounds.energy_lower_bound; either may be None), uses up
+    # maxEvaluations, passes its deadline (seconds after the run starts) or is
+    # cancelled. The run advances in slices of sliceSteps crossover steps: run()
+    # loops over them in the calling thread, improvements() is an async generator
+    # that yields to the event loop between slices, so many runs can share one
+    # event loop without a thread each.
+    #
+    # Evaluations are counted from the energy evaluations each step adds to the
+    # population's own evaluations counter, starting at `evaluations`, so runs of
+    # different populations may share a process, an event loop or an executor.
+    def __init__(self, pop, minEnergy, maxEvaluations, deadline=None, evaluations=0, batchSize=0,
+                 sliceSteps=100, telemetry=None, checkpointer=None, bound=None):
+        self.pop = pop
+        self.minEnergy = minEnergy
+        self.bound = bound
+        self.maxEvaluations = maxEvaluations
+        self.deadline = deadline
+        self.evaluations = evaluations
+        # Offspring steps per call to ArrayPopulation.crossover_batch (0 = one crossover per step)
+        self.batchSize = batchSize
+        self.sliceSteps = sliceSteps
+        self.telemetry = telemetry
+        self.checkpointer = checkpointer
+        self.generation = 0
+        self.cancelled = False
+        self.reason = None
+        self.startTime = None
+        self.stopTime = None
+        fittest = pop.get_fittest()
+        self.best = fittest.copy()
+        self.bestFitness = fittest.get_fitness()
+        self.evaluationsToBest = 0
+        self.generationsToBest = 0
+        self.birthGeneration = fittest.get_generation()
+
+    def cancel(self):
+        # Stop after the current step; safe to call from another thread.
+        self.cancelled = True
+
+    def stop_reason(self):
+        if self.bound is not None and self.bestFitness <= self.bound:
+            return "bound"
+        if self.minEnergy is not None and self.bestFitness <= self.minEnergy:
+            return "optimum"
+        if self.evaluations >= self.maxEvaluations:
+            return "evaluations"
+        if self.cancelled:
+            return "cancelled"
+        if self.deadline is not None and time.perf_counter() - self.startTime >= self.deadline:
+            return "deadline"
+        return None
+
+    def run_slice(self, steps):
+        # Up to steps crossover steps; returns the improvements found. Sets reason
+        # once the run is over.
+        if self.startTime is None:
+            self.startTime = time.perf_counter()
+        pop = self.pop
+        found = []
+        while steps > 0:
+            self.reason = self.stop_reason()
+            if self.reason is not None:
+                self.stopTime = time.perf_counter()
+                break
+            steps -= 1
+            before = pop.evaluations
+            if self.batchSize:
+                pop.crossover_batch(self.batchSize)
+            else:
+                pop.crossover()
+            self.evaluations += pop.evaluations - before
+            self.generation += 1
+            if self.telemetry is not None:
+                self.telemetry.step(self.generation)
+            if self.checkpointer is not None:
+                self.checkpointer.step(pop)
+            current = pop.get_fittest()
+            if current.get_fitness() < self.bestFitness:
+                self.best = current.copy()
+                self.bestFitness = current.get_fitness()
+                self.evaluationsToBest = self.evaluations
+                self.generationsToBest = self.generation
+                self.birthGeneration = current.get_generation()
+                found.append(Improvement(self.bestFitness, self.evaluations, self.generation,
+                                         time.perf_counter() - self.startTime, self.best))
+        return found
+
+    def result(self):
+        # The best fold so far; also valid while the run is still going.
+        end = self.stopTime if self.stopTime is not None else time.perf_counter()
+        seconds = end - self.startTime if self.startTime is not None else 0.0
+        gap = self.bestFitness - self.bound if self.bound is not None else None
+        return RunResult(self.best, self.bestFitness, self.evaluations, self.generation, self.evaluationsToBest,
+                         self.generationsToBest, self.birthGeneration, seconds, self.reason, self.bound, gap)
+
+    def run(self, onImprovement=None):
+        # Run to the end in this thread, calling onImprovement(improvement) for every new best.
+        while self.reason is None:
+            for improvement in self.run_slice(self.sliceSteps):
+                if onImprovement is not None:
+                    onImprovement(improvement)
+        return self.result()
+
+    async def improvements(self):
+        # Async stream of the run's improvements; the run advances while it is consumed.
+        while self.reason is None:
+            for improvement in self.run_slice(self.sliceSteps):
+                yield improvement
+            await asyncio.sleep(0)
+
+    async def run_async(self, onImprovement=None):
+        # Awaitable run on the event loop. Cancelling the awaiting task stops the run;
+        # result() still holds the best fold found until then.
+        try:
+            async for improvement in self.improvements():
+                if onImprovement is not None:
+                    onImprovement(improvement)
+        except asyncio.CancelledError:
+            self.cancel()
+            self.reason = "cancelled"
+            self.stopTime = time.perf_counter()
+            raise
+        return self.result()
+
+    async def run_in_executor(self, executor=None, onImprovement=None):
+        # Awaitable run() in an executor thread, for callers that prefer not to share
+        # the event loop with the GA; cancelling the awaiting task stops the thread's run.
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, self.run, onImprovement)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
@@ -0,0 +1,139 @@
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+from Conformation import fused_walk
+
+# Shared buffer layout for capacity rows: fitness (int32 per row), then validity
+# (one byte per row), then the encodings (moves signed bytes per row). Fitness
+# comes first so its int32 view is aligned.
+FITNESS_SIZE = 4
+# Seconds between checks that the workers are still alive while waiting for a task
+POLL_SECONDS = 0.5
+
+
+def buffer_views(buf, capacity, moves):
+    # (fitness, valid, encodings) memoryviews over a shared buffer
+    validOffset = FITNESS_SIZE * capacity
+    encodingOffset = validOffset + capacity
+    fitness = buf[:validOffset].cast('i')
+    valid = buf[validOffset:encodingOffset]
+    encodings = buf[encodingOffset:encodingOffset + capacity * moves].cast('b')
+    return fitness, valid, encodings
+
+
+def evaluation_worker(name, capacity, moves, hydrophobic, tasks, done):
+    # Worker process: scores the rows [start, stop) of each task in place in the
+    # shared buffer until it receives None.
+    shm = shared_memory.SharedMemory(name=name)
+    fitness, valid, encodings = buffer_views(shm.buf, capacity, moves)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            start, stop = task
+            try:
+                for r in range(start, stop):
+                    ok, energy, _, _, _ = fused_walk(encodings[r * moves:(r + 1) * moves], hydrophobic)
+                    valid[r] = ok
+                    fitness[r] = energy
+                done.put(None)
+            except Exception as error:
+                done.put(repr(error))
+    finally:
+        del fitness, valid, encodings
+        shm.close()
+
+
+class SharedEvaluator:
+    # Persistent pool of worker processes that validate and score encodings in a
+    # multiprocessing.shared_memory buffer. The coordinator copies a batch of
+    # encodings into the buffer and hands out row ranges; the workers decode and
+    # score their rows in place and write validity and fitness next to them, so
+    # nothing but (start, stop) pairs is ever pickled. Call close() (or use it as a
+    # context manager) to stop the workers and free the buffer. evaluate() raises
+    # RuntimeError if a worker dies or a task takes longer than timeout seconds.
+    def __init__(self, prot, workers, capacity=1024, rowsPerTask=None, timeout=60.0):
+        self.moves = max(prot.getLength() - 2, 0)
+        self.capacity = capacity
+        self.workers = workers
+        # Rows per task; by default every batch is cut into two tasks per worker
+        self.rowsPerTask = rowsPerTask
+        self.timeout = timeout
+        size = (FITNESS_SIZE + 1 + self.moves) * capacity
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.fitness, self.valid, self.encodings = buffer_views(self.shm.buf, capacity, self.moves)
+        ctx = mp.get_context()
+        self.tasks = ctx.Queue()
+        self.done = ctx.Queue()
+        self.processes = [ctx.Process(target=evaluation_worker, daemon=True,
+                                      args=(self.shm.name, capacity, self.moves, prot.getHydrophobic(),
+                                            self.tasks, self.done))
+                          for _ in range(workers)]
+        for process in self.processes:
+            process.start()
+
+    def evaluate(self, encodings):
+        # (valid, fitness) lists for a sequence of encodings, evaluated by the workers
+        valid = []
+        fitness = []
+        moves = self.moves
+        for first in range(0, len(encodings), self.capacity):
+            chunk = encodings[first:first + self.capacity]
+            rows = len(chunk)
+            for r, encoding in enumerate(chunk):
+                self.encodings[r * moves:(r + 1) * moves] = encoding
+            step = self.rowsPerTask or max(1, -(-rows // (2 * self.workers)))
+            tasks = 0
+            for start in range(0, rows, step):
+                self.tasks.put((start, min(start + step, rows)))
+                tasks += 1
+            errors = [error for error in (self.wait_task() for _ in range(tasks)) if error is not None]
+            if errors:
+                raise RuntimeError("Evaluation worker failed: " + errors[0])
+            valid.extend(map(bool, self.valid[:rows]))
+            fitness.extend(self.fitness[:rows])
+        return valid, fitness
+
+    def wait_task(self):
+        # Next finished task (None, or the error it raised), checking the workers are
+        # still alive while waiting
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            try:
+                return self.done.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                pass
+            dead = [process for process in self.processes if not process.is_alive()]
+            if dead:
+                self.terminate()
+                raise RuntimeError(f"Evaluation worker exited with code {dead[0].exitcode}")
+            if time.perf_counter() >= deadline:
+                self.terminate()
+                raise RuntimeError(f"Evaluation task took longer than {self.timeout} seconds")
+
+    def terminate(self):
+        # Stop every worker at once; their tasks are lost, so the evaluator can only be closed
+        for process in self.processes:
+            process.terminate()
+            process.join()
+
+    def close(self):
+        if self.shm is None:
+            return
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        del self.fitness, self.valid, self.encodings
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
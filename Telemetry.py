@@ -0,0 +1,168 @@
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+
+import numpy as np
+
+# Log layout: a file header naming the columns and their array typecodes, then any
+# number of chunks appended one after another. A chunk is CHUNK (row count)
+# followed by each column's values for those rows as one contiguous array, so a
+# reader only ever holds one chunk in memory.
+MAGIC = b"HPTL"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHBH")
+CHUNK = struct.Struct("<I")
+COLUMNS = (
+    ("generation", "q"),
+    ("evaluations", "q"),
+    ("best", "i"),
+    ("mean", "d"),
+    ("q10", "i"),
+    ("median", "i"),
+    ("q90", "i"),
+    ("diversity", "d"),
+    ("accepted", "q"),
+    ("rejected", "q"),
+    ("seconds", "d"),
+)
+
+
+def population_arrays(pop):
+    # (fitness, encodings) of a Population or ArrayPopulation as NumPy arrays
+    if hasattr(pop, "encodings"):
+        return pop.fitness, pop.encodings
+    fitness = np.fromiter((indiv.get_fitness() for indiv in pop.individuals), dtype=np.int32,
+                          count=len(pop.individuals))
+    data = b"".join(indiv.get_encoding().tobytes() for indiv in pop.individuals)
+    encodings = np.frombuffer(data, dtype=np.int8).reshape(len(pop.individuals), -1)
+    return fitness, encodings
+
+
+def positional_entropy(encodings):
+    # Mean Shannon entropy (bits) of the move at each encoding position: 0 when the
+    # population agrees everywhere, log2(3) when every move is equally common.
+    if encodings.shape[1] == 0:
+        return 0.0
+    counts = np.stack([(encodings == d).sum(axis=0) for d in (-1, 0, 1)])
+    p = counts / encodings.shape[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(p > 0, -p * np.log2(p), 0.0)
+    return float(terms.sum(axis=0).mean())
+
+
+class TelemetryWriter:
+    # Append-only columnar log. Rows are buffered per column and every chunkRows
+    # rows the chunk is handed to a background thread that appends it to the file,
+    # so append() never waits for I/O.
+    def __init__(self, path, chunkRows=256):
+        self.path = path
+        self.chunkRows = chunkRows
+        self.columns = [array(code) for _, code in COLUMNS]
+        self.pending = queue.Queue()
+        with open(path, "ab") as file:
+            if file.tell() == 0:
+                names = "\0".join(name for name, _ in COLUMNS).encode("ascii")
+                codes = "".join(code for _, code in COLUMNS).encode("ascii")
+                file.write(FILE_HEADER.pack(MAGIC, VERSION, sys.byteorder == "little", len(names)))
+                file.write(names + codes)
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        if len(self.columns[0]) >= self.chunkRows:
+            self.flush()
+
+    def flush(self):
+        # Hand the buffered rows to the writer thread.
+        rows = len(self.columns[0])
+        if rows:
+            self.pending.put(CHUNK.pack(rows) + b"".join(column.tobytes() for column in self.columns))
+            self.columns = [array(code) for _, code in COLUMNS]
+
+    def write_chunks(self):
+        with open(self.path, "ab") as file:
+            while True:
+                chunk = self.pending.get()
+                if chunk is None:
+                    return
+                file.write(chunk)
+                file.flush()
+
+    def close(self):
+        # Flush the last rows and wait until everything is on disk.
+        self.flush()
+        self.pending.put(None)
+        self.writer.join()
+
+
+def read_chunks(path):
+    # Stream a telemetry log one chunk at a time, as {column: array} dicts.
+    with open(path, "rb") as file:
+        magic, version, little, namesSize = FILE_HEADER.unpack(file.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a version " + str(VERSION) + " telemetry log: " + str(path))
+        names = file.read(namesSize).decode("ascii").split("\0")
+        codes = file.read(len(names)).decode("ascii")
+        swap = little != (sys.byteorder == "little")
+        while True:
+            header = file.read(CHUNK.size)
+            if len(header) < CHUNK.size:
+                return
+            rows, = CHUNK.unpack(header)
+            chunk = {}
+            for name, code in zip(names, codes):
+                values = array(code)
+                values.frombytes(file.read(rows * values.itemsize))
+                if swap:
+                    values.byteswap()
+                chunk[name] = values
+            yield chunk
+
+
+def read_records(path):
+    # Stream a telemetry log one record (dict) at a time.
+    for chunk in read_chunks(path):
+        names = list(chunk)
+        for values in zip(*chunk.values()):
+            yield dict(zip(names, values))
+
+
+class Telemetry:
+    # Samples a population every `every` generations into a TelemetryWriter:
+    # best, mean and 10/50/90% quantile fitness, positional diversity of the
+    # encodings, children accepted and rejected since the last record, and the
+    # population's evaluations since telemetry started.
+    def __init__(self, pop, path, every=1000, chunkRows=256):
+        self.pop = pop
+        self.every = every
+        self.log = TelemetryWriter(path, chunkRows)
+        self.startTime = time.perf_counter()
+        self.startEvaluations = pop.evaluations
+        self.lastAccepted = pop.acceptedCount
+        self.lastRejected = pop.rejectedCount
+
+    def step(self, generation):
+        # Call once per generation (crossover step).
+        if generation % self.every == 0:
+            self.record(generation)
+
+    def record(self, generation):
+        pop = self.pop
+        fitness, encodings = population_arrays(pop)
+        ordered = np.sort(fitness)
+        last = len(ordered) - 1
+        accepted = pop.acceptedCount - self.lastAccepted
+        rejected = pop.rejectedCount - self.lastRejected
+        self.lastAccepted, self.lastRejected = pop.acceptedCount, pop.rejectedCount
+        self.log.append((generation, pop.evaluations - self.startEvaluations, int(ordered[0]),
+                         float(ordered.mean()), int(ordered[last // 10]), int(ordered[last // 2]),
+                         int(ordered[last * 9 // 10]), positional_entropy(encodings), accepted, rejected,
+                         time.perf_counter() - self.startTime))
+
+    def close(self):
+        self.log.close()
@@ -0,0 +1,118 @@
+import argparse
+import contextlib
+import csv
+import io
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from Conformation import Conformation
+from Protein import Protein
+from Population import Population
+from Runner import Runner
+from Bounds import energy_lower_bound, read_sequences
+
+# Configuration constants
+REPETITIONS = 5                 # runs of every sequence
+POPULATION_SIZE = 500
+MUTATION_PROBABILITY = 0.05
+CROSSOVER_PROBABILITY = 0.85
+MAX_EVALUATIONS = 200000        # evaluation budget of every run
+BASE_SEED = 42                  # repetition r of every sequence is seeded with BASE_SEED + r
+WORKERS = os.cpu_count() or 1
+RESULTS_FILENAME = "batch_results.csv"
+COLUMNS = ["Length", "Repetition", "Seed", "KnownOptimum", "LowerBound", "BestEnergy", "Gap", "Reason",
+           "Evaluations", "EvalToBest", "GenerationsToBest", "Seconds", "Sequence"]
+
+
+def make_jobs(sequences, repetitions):
+    # One (length, sequence, optimum, repetition, seed) job per run, longest expected
+    # first: a run's cost grows with the chain length (longer walks per evaluation,
+    # and long chains rarely stop before their budget), so starting the long runs
+    # first keeps every worker busy until the end instead of leaving one long run
+    # to finish alone.
+    jobs = [(length, sequence, optimum, r, BASE_SEED + r)
+            for length, sequence, optimum in sequences for r in range(1, repetitions + 1)]
+    jobs.sort(key=lambda job: job[0], reverse=True)
+    return jobs
+
+
+def run_job(job, populationSize=POPULATION_SIZE, maxEvaluations=MAX_EVALUATIONS):
+    # One complete, seeded run; depends on nothing but its arguments so it can run in any worker process
+    length, sequence, optimum, repetition, seed = job
+    random.seed(seed)
+    Conformation.energyEvalSteps = 0
+    prot = Protein(sequence)
+    with contextlib.redirect_stdout(io.StringIO()):
+        pop = Population(populationSize, prot, MUTATION_PROBABILITY, CROSSOVER_PROBABILITY)
+    bound = energy_lower_bound(prot)
+    result = Runner(pop, optimum, maxEvaluations, bound=bound).run()
+    return [length, repetition, seed, optimum, bound, result.fitness, result.gap, result.reason,
+            result.evaluations, result.evaluationsToBest, result.generationsToBest, round(result.seconds, 3), sequence]
+
+
+def run_batch(jobs, workers=WORKERS, filename=RESULTS_FILENAME, populationSize=POPULATION_SIZE,
+              maxEvaluations=MAX_EVALUATIONS):
+    # Run every job and stream the rows into one CSV as they complete. Returns the
+    # rows and the wall-clock seconds of the whole batch.
+    rows = []
+    began = time.perf_counter()
+    with open(filename, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS)
+
+        def log(row):
+            writer.writerow(row)
+            file.flush()
+            rows.append(row)
+            print(f"{row[0]:>3}-mer run {row[1]}: BestEnergy={row[5]} (optimum {row[3]}, bound {row[4]}), "
+                  f"EvalToBest={row[9]}, {row[7]}, {row[11]:.1f}s")
+
+        if workers <= 1:
+            for job in jobs:
+                log(run_job(job, populationSize, maxEvaluations))
+        else:
+            # The pool starts jobs in submission order, so the longest go first
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(run_job, job, populationSize, maxEvaluations) for job in jobs]
+                for future in as_completed(futures):
+                    log(future.result())
+    return rows, time.perf_counter() - began
+
+
+def summarize(rows, wallSeconds):
+    print("\n=== Batch Summary ===")
+    print(f"{'Length':>6} {'Runs':>5} {'Optimum':>8} {'Bound':>6} {'Reached':>8} {'MeanBest':>9} {'MeanEvalToBest':>15}")
+    for length in sorted({row[0] for row in rows}):
+        runs = [row for row in rows if row[0] == length]
+        optimum, bound = runs[0][3], runs[0][4]
+        reached = sum(row[5] <= optimum for row in runs)
+        print(f"{length:>6} {len(runs):>5} {optimum:>8} {bound:>6} {reached:>5}/{len(runs):<2} "
+              f"{statistics.mean(row[5] for row in runs):>9.2f} {statistics.mean(row[9] for row in runs):>15.0f}")
+    cpuSeconds = sum(row[11] for row in rows)
+    print(f"Wall time {wallSeconds:.1f}s for {cpuSeconds:.1f}s of runs "
+          f"(slowest run {max(row[11] for row in rows):.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every sequence of protein_sequence.txt across a process pool")
+    parser.add_argument("--repetitions", type=int, default=REPETITIONS)
+    parser.add_argument("--lengths", type=int, nargs="+", help="only these sequence lengths")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--population", type=int, default=POPULATION_SIZE)
+    parser.add_argument("--max-evaluations", type=int, default=MAX_EVALUATIONS)
+    parser.add_argument("--output", default=RESULTS_FILENAME, help="consolidated results CSV")
+    args = parser.parse_args()
+
+    sequences = [s for s in read_sequences() if args.lengths is None or s[0] in args.lengths]
+    jobs = make_jobs(sequences, args.repetitions)
+    print(f"Running {len(jobs)} jobs ({len(sequences)} sequences x {args.repetitions}) on {args.workers} workers...\n")
+    rows, wallSeconds = run_batch(jobs, args.workers, args.output, args.population, args.max_evaluations)
+    summarize(rows, wallSeconds)
+    print("Results written to", args.output)
+
+
+if __name__ == "__main__":
+    main()
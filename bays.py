@@ -1,30 +1,46 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
 from bayes_opt import BayesianOptimization
 from Conformation import Conformation
 from Protein import Protein
 from Population import Population
+from ArrayPopulation import ArrayPopulation
+from Checkpoint import Checkpointer, load_checkpoint
+from Runner import Runner
+from Bounds import energy_lower_bound, target_energy
 
 # Global variables as before.
-global_fittest_ptr = None
-isTerminated = False
 switch_enable_graphics = False  
-switch_minen = -52              
+switch_minen = None             # None = known optimum of switch_sequence, else its lower bound (Bounds.py)
 switch_max_evaluations = 1000000 
+switch_sequence = "BBBBWWWWBBBBBBBBBBBBWWWWWWBBBBBBBBBBBBWWWBBBBBBBBBBBBWWWBBBBBBBBBBBBWWWBWWBBWWBBWWBWB"
+switch_array_population = False
+# Offspring steps per call to ArrayPopulation.crossover_batch (0 = one crossover per call)
+offspring_batch_size = 0
+# Print Population.metrics_snapshot() after every trial
+switch_metrics = False
+# Trials evaluated at once in a worker pool (1 = one trial at a time in this process,
+# as before; e.g. os.cpu_count() to use every core)
+switch_parallel_trials = 1
+# Directory for per-trial checkpoints (None = no checkpoints). An interrupted trial is
+# resumed from its checkpoint when it is run again with the same parameters.
+switch_checkpoint_dir = None
+# Crossover steps between checkpoints
+switch_checkpoint_interval = 20000
 
-def calculation(pop: Population):
-    global global_fittest_ptr, isTerminated
-    global_fittest_ptr = pop.get_fittest()
-    
+def print_improvement(improvement):
+    if not switch_enable_graphics:
+        print(improvement.conformation.getStatusString())
+        improvement.conformation.printAsciiPicture()
+
+def calculation(pop: Population, checkpointer: Checkpointer = None):
+    stop = switch_minen if switch_minen is not None else target_energy(pop.protein)[0]
     # Continue until the fittest's fitness reaches threshold or max evaluations are exceeded.
-    while pop.get_fittest().get_fitness() > switch_minen and Conformation.energyEvalSteps < switch_max_evaluations:
-        pop.crossover()
-        
-        if pop.get_fittest().get_fitness() < global_fittest_ptr.get_fitness():
-            global_fittest_ptr = pop.get_fittest()
-            if not switch_enable_graphics:
-                print(global_fittest_ptr.getStatusString())
-                global_fittest_ptr.printAsciiPicture()
-    
-    isTerminated = True
+    runner = Runner(pop, stop, switch_max_evaluations, evaluations=pop.evaluations,
+                    batchSize=offspring_batch_size, checkpointer=checkpointer, bound=energy_lower_bound(pop.protein))
+    return runner.run(print_improvement)
 
 def run_ga(population_size: float, mutation_probability: float, crossover_probability: float) -> float:
     """
@@ -34,31 +50,56 @@ def run_ga(population_size: float, mutation_probability: float, crossover_probab
     # Convert population_size to integer for the GA.
     pop_size = int(population_size)
     # Use the same protein sequence as before.
-    prot = Protein("BBBBWWWWBBBBBBBBBBBBWWWWWWBBBBBBBBBBBBWWWBBBBBBBBBBBBWWWBBBBBBBBBBBBWWWBWWBBWWBBWWBWB")
+    prot = Protein(switch_sequence)
     
     # Reset evaluation counter for fairness.
     Conformation.energyEvalSteps = 0
+    checkpointer = None
     # Create the Population instance with the given hyperparameters.
-    pop = Population(pop_size, prot, mutation_probability, crossover_probability)
+    if switch_array_population or offspring_batch_size:
+        pop = ArrayPopulation(pop_size, prot, mutation_probability, crossover_probability)
+    else:
+        if switch_checkpoint_dir is not None:
+            path = os.path.join(switch_checkpoint_dir, f"trial_{pop_size}_{mutation_probability:.6f}_"
+                                                       f"{crossover_probability:.6f}.ckpt")
+            checkpointer = Checkpointer(path, switch_checkpoint_interval)
+        if checkpointer is not None and os.path.exists(path):
+            # Resume an interrupted trial; also restores the evaluation counter and RNG state.
+            pop = load_checkpoint(path)
+            print(f"Resumed trial from {path} at {pop.evaluations} evaluations")
+        else:
+            pop = Population(pop_size, prot, mutation_probability, crossover_probability)
+        if switch_metrics:
+            pop.enable_metrics()
     
     # Run the GA.
-    calculation(pop)
+    result = calculation(pop, checkpointer)
+    if checkpointer is not None:
+        # The trial is complete, so its checkpoint is no longer needed.
+        checkpointer.wait()
+        if os.path.exists(path):
+            os.remove(path)
     
     fittest = pop.get_fittest()
     final_fitness = fittest.get_fitness()
-    print(f"Run complete with params: pop_size={pop_size}, mut_prob={mutation_probability}, cross_prob={crossover_probability} => final fitness: {final_fitness}")
+    print(f"Run complete with params: pop_size={pop_size}, mut_prob={mutation_probability}, cross_prob={crossover_probability} => final fitness: {final_fitness} (gap to lower bound {result.gap})")
+    if switch_metrics and isinstance(pop, Population):
+        print("Metrics:", pop.metrics_snapshot())
     
     # Return negative fitness so that a lower fitness (better) gives a higher objective.
     return -final_fitness
 
+# Define the parameter bounds.
+pbounds = {
+    'population_size': (500, 2000),
+    'mutation_probability': (0.01, 0.4),
+    'crossover_probability': (0.4, 0.9)
+}
+
 def bayesian_optimization():
-    # Define the parameter bounds.
-    pbounds = {
-        'population_size': (500, 2000),
-        'mutation_probability': (0.01, 0.4),
-        'crossover_probability': (0.4, 0.9)
-    }
-    
+    if switch_parallel_trials > 1:
+        return parallel_bayesian_optimization(init_points=5, n_iter=10, workers=switch_parallel_trials)
+
     optimizer = BayesianOptimization(
         f=run_ga,
         pbounds=pbounds,
@@ -70,6 +111,55 @@ def bayesian_optimization():
     optimizer.maximize(init_points=5, n_iter=10)
     return optimizer.max
 
+# Module switches a trial depends on; passed explicitly to worker processes.
+TRIAL_SWITCHES = ('switch_enable_graphics', 'switch_minen', 'switch_max_evaluations', 'switch_sequence',
+                  'switch_array_population', 'offspring_batch_size', 'switch_metrics',
+                  'switch_checkpoint_dir', 'switch_checkpoint_interval')
+
+def run_trial(switches: dict, params: dict) -> float:
+    # Entry point of a worker process: apply the caller's switches, then run one trial.
+    globals().update(switches)
+    return run_ga(**params)
+
+def parallel_bayesian_optimization(init_points: int, n_iter: int, workers: int):
+    """
+    Asynchronous batch version of bayesian_optimization: keeps up to `workers` trials
+    running in a process pool, registers each result as soon as it completes and
+    immediately asks the optimizer for the next point. Every trial runs in a fresh
+    worker process, so the module globals and the Conformation evaluation counter
+    never leak from one trial into another.
+    """
+    optimizer = BayesianOptimization(
+        f=None,
+        pbounds=pbounds,
+        random_state=42,
+        verbose=2,
+        allow_duplicate_points=True
+    )
+    rng = np.random.RandomState(42)
+    total = init_points + n_iter
+    submitted = 0
+
+    def next_point():
+        # Random probes first, then points suggested from the results registered so far.
+        if submitted < init_points:
+            return {key: rng.uniform(low, high) for key, (low, high) in pbounds.items()}
+        return optimizer.suggest()
+
+    switches = {name: globals()[name] for name in TRIAL_SWITCHES}
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as executor:
+        pending = {}
+        while submitted < total or pending:
+            while submitted < total and len(pending) < workers:
+                params = next_point()
+                pending[executor.submit(run_trial, switches, params)] = params
+                submitted += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                params = pending.pop(future)
+                optimizer.register(params=params, target=future.result())
+    return optimizer.max
+
 def bayesian_GA():
     print("Running Bayesian Optimization for Hyperparameter Tuning")
     best = bayesian_optimization()
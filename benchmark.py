@@ -0,0 +1,173 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import time
+import timeit
+
+from Conformation import Conformation, decode_walk, fused_walk
+from Protein import Protein
+from Population import Population
+from Bounds import read_sequences
+
+# Configuration constants
+BASELINE_FILENAME = "benchmark_baseline.json"
+SEED = 42
+REPEATS = 3                     # timing samples per micro benchmark; the fastest is kept
+POPULATION_SIZE = 200           # population for the Population micro benchmarks
+MUTATION_PROBABILITY = 0.05
+CROSSOVER_PROBABILITY = 0.85
+MACRO_POPULATION_SIZE = 500
+MACRO_EVALUATIONS = 20000       # evaluations timed by the evaluations/sec benchmark
+OPTIMUM_MAX_LENGTH = 25         # time to optimum only for sequences up to this length
+OPTIMUM_MAX_EVALUATIONS = 200000
+THRESHOLD = 0.20                # relative slowdown reported as a regression
+
+
+def silent_population(size, prot):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Population(size, prot, MUTATION_PROBABILITY, CROSSOVER_PROBABILITY)
+
+
+def time_per_call(fn, repeats):
+    # Seconds per call of fn: the fastest of repeats samples of at least 0.2 s each.
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeats, loops)) / loops
+
+
+def micro_benchmarks(prot, repeats=REPEATS):
+    # Seconds per call of the hot Conformation and Population functions.
+    random.seed(SEED)
+    collisionSet = set()
+    conf = Conformation(prot)
+    conf.setOfPoints = collisionSet
+    conf.generate_grown_conformation()
+    other = Conformation(prot)
+    other.setOfPoints = collisionSet
+    other.generate_grown_conformation()
+    conf.evaluate()
+    other.evaluate()
+    mutant = conf.copy()
+    pop = silent_population(POPULATION_SIZE, prot)
+    benchmarks = {
+        "calculate_absolute_position": conf.calculate_absolute_position,
+        "calculate_fitness": conf.calculate_fitness,
+        "calculate_validity": conf.calculate_validity,
+        "decode_walk": lambda: decode_walk(conf.encoding),
+        "fused_walk": lambda: fused_walk(conf.encoding, prot.getHydrophobic()),
+        "mutate_directed": lambda: mutant.mutate_directed(MUTATION_PROBABILITY),
+        "mutate_corner_flip": lambda: mutant.mutate_corner_flip(MUTATION_PROBABILITY),
+        "mutate_crankshaft": lambda: mutant.mutate_crankshaft(1.0),
+        "Conformation.crossover": lambda: Conformation.crossover(conf, other, collisionSet),
+        "Population.tournament_select": pop.tournament_select,
+        "Population.crossover": pop.crossover,
+        "Population.__init__": lambda: silent_population(POPULATION_SIZE, prot),
+    }
+    steps = Conformation.energyEvalSteps
+    results = {name: time_per_call(fn, repeats) for name, fn in benchmarks.items()}
+    Conformation.energyEvalSteps = steps
+    return results
+
+
+def evaluations_per_second(prot):
+    # End-to-end GA throughput over MACRO_EVALUATIONS evaluations.
+    random.seed(SEED)
+    pop = silent_population(MACRO_POPULATION_SIZE, prot)
+    start = Conformation.energyEvalSteps
+    began = time.perf_counter()
+    while Conformation.energyEvalSteps - start < MACRO_EVALUATIONS:
+        pop.crossover()
+    return (Conformation.energyEvalSteps - start) / (time.perf_counter() - began)
+
+
+def time_to_optimum(prot, optimum):
+    # Seconds (including initialization) and evaluations of a seeded run until the
+    # known optimum is found; reached is False if OPTIMUM_MAX_EVALUATIONS ran out first.
+    random.seed(SEED)
+    began = time.perf_counter()
+    start = Conformation.energyEvalSteps
+    pop = silent_population(MACRO_POPULATION_SIZE, prot)
+    while pop.get_fittest().get_fitness() > optimum and \
+            Conformation.energyEvalSteps - start < OPTIMUM_MAX_EVALUATIONS:
+        pop.crossover()
+    return {"value": time.perf_counter() - began, "evaluations": Conformation.energyEvalSteps - start,
+            "reached": pop.get_fittest().get_fitness() <= optimum}
+
+
+def run_benchmarks(sequences, repeats=REPEATS, macro=True):
+    # Results keyed "<benchmark>/<length>". Every value is lower-is-better except
+    # those marked higher_is_better.
+    results = {}
+    for length, sequence, optimum in sequences:
+        prot = Protein(sequence)
+        for name, seconds in micro_benchmarks(prot, repeats).items():
+            results[f"micro/{name}/{length}"] = {"value": seconds, "unit": "s/call"}
+            print(f"{name:<30}{length:>4}  {seconds * 1e6:12.2f} us/call")
+        if not macro:
+            continue
+        rate = evaluations_per_second(prot)
+        results[f"macro/evaluations_per_second/{length}"] = {"value": rate, "unit": "1/s", "higher_is_better": True}
+        print(f"{'evaluations/sec':<30}{length:>4}  {rate:12.0f}")
+        if length <= OPTIMUM_MAX_LENGTH:
+            entry = time_to_optimum(prot, optimum)
+            entry["unit"] = "s"
+            results[f"macro/time_to_optimum/{length}"] = entry
+            print(f"{'time to optimum':<30}{length:>4}  {entry['value']:12.2f} s  "
+                  f"({entry['evaluations']} evaluations, reached={entry['reached']})")
+    return results
+
+
+def compare(baseline, results, threshold=THRESHOLD):
+    # (key, baseline value, new value, relative slowdown) of every benchmark that got
+    # more than threshold slower; runs that missed the optimum are not compared.
+    regressions = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if old is None or not old.get("reached", True) or not new.get("reached", True):
+            continue
+        if new.get("higher_is_better"):
+            slowdown = old["value"] / new["value"] - 1
+        else:
+            slowdown = new["value"] / old["value"] - 1
+        if slowdown > threshold:
+            regressions.append((key, old["value"], new["value"], slowdown))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro and macro benchmarks of the HP folding GA")
+    parser.add_argument("--save", metavar="FILE", nargs="?", const=BASELINE_FILENAME,
+                        help="store the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", nargs="?", const=BASELINE_FILENAME,
+                        help="compare against a JSON baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="relative slowdown reported as a regression (default %(default)s)")
+    parser.add_argument("--lengths", type=int, nargs="+", help="only these sequence lengths")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--micro-only", action="store_true", help="skip the end-to-end benchmarks")
+    args = parser.parse_args()
+
+    sequences = [s for s in read_sequences() if args.lengths is None or s[0] in args.lengths]
+    results = run_benchmarks(sequences, args.repeats, macro=not args.micro_only)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "created": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}, file, indent=1)
+        print("Baseline written to", args.save)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(baseline, results, args.threshold)
+        for key, old, new, slowdown in regressions:
+            print(f"REGRESSION {key}: {old:.6g} -> {new:.6g} ({slowdown:+.0%})")
+        print(f"{len(regressions)} regressions above {args.threshold:.0%} against {args.compare}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import contextlib
+import io
+import multiprocessing as mp
+import queue
+import random
+import struct
+from array import array
+from Conformation import Conformation, pack_encoding, unpack_encoding
+from Protein import Protein
+from Population import Population
+from Runner import Runner
+from Bounds import energy_lower_bound, target_energy
+
+# Configuration constants
+SEQUENCE = "BBBBWWWWBBBBBBBBBBBBWWWWWWBBBBBBBBBBBBWWWBBBBBBBBBBBBWWWBBBBBBBBBBBBWWWBWWBBWWBBWWBWB"
+POPULATION_SIZE = 500
+MUTATION_PROBABILITY = 0.05
+CROSSOVER_PROBABILITY = 0.85
+SWITCH_MIN_ENERGY = None    # None = known optimum of SEQUENCE, else its lower bound (Bounds.py)
+SWITCH_MAX_EVALUATIONS = 1000000
+ISLANDS = 4
+MIGRATION_INTERVAL = 2000   # crossover steps between migrations
+MIGRANTS = 2                # best conformations sent per migration
+TOPOLOGY = "ring"           # "ring" (to the next island) or "all" (to every other island)
+SEED = 42
+STOP_CHECK_STEPS = 100      # crossover steps between checks for another island's stop signal
+RESULT_POLL_SECONDS = 1.0   # wait for island results this long before checking the islands are alive
+
+# Wire format: a header (island id, migrant count, moves) followed by one record
+# per conformation (fitness, generation, 2-bit packed encoding).
+HEADER = struct.Struct("<HHH")
+RECORD = struct.Struct("<hI")
+
+
+def pack_migrants(islandId, conformations, moves):
+    parts = [HEADER.pack(islandId, len(conformations), moves)]
+    for conf in conformations:
+        parts.append(RECORD.pack(conf.get_fitness(), conf.get_generation()))
+        parts.append(pack_encoding(conf.get_encoding()))
+    return b"".join(parts)
+
+
+def unpack_migrants(data, protein):
+    # Rebuild the conformations of a message for the given protein.
+    islandId, count, moves = HEADER.unpack_from(data, 0)
+    width = (moves + 3) // 4
+    offset = HEADER.size
+    conformations = []
+    for _ in range(count):
+        fitness, generation = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        conf = Conformation()
+        conf.protein = protein
+        conf.length = protein.getLength()
+        conf.encoding = array('b', unpack_encoding(data[offset:offset + width], moves))
+        offset += width
+        conf.evaluate(score=False)
+        conf.fitness = fitness
+        conf.generation = generation
+        conformations.append(conf)
+    return islandId, conformations
+
+
+def neighbours(islandId, islands, topology):
+    if topology == "ring":
+        return [(islandId + 1) % islands] if islands > 1 else []
+    if topology == "all":
+        return [j for j in range(islands) if j != islandId]
+    raise ValueError("Unknown migration topology: " + str(topology))
+
+
+def island(islandId, sequence, params, inboxes, stopEvent, results):
+    # Evolves one Population in its own process and exchanges its best
+    # conformations with the neighbouring islands every migration interval.
+    (size, mutProb, crossProb, minEnergy, maxEvaluations,
+     islands, interval, migrants, topology, seed) = params
+    random.seed(seed + islandId)
+    prot = Protein(sequence)
+    moves = max(prot.getLength() - 2, 0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        pop = Population(size, prot, mutProb, crossProb)
+    inbox = inboxes[islandId]
+    outboxes = [inboxes[j] for j in neighbours(islandId, islands, topology)]
+    # Migrants are best-effort: never block exit on undelivered messages.
+    for q in inboxes:
+        q.cancel_join_thread()
+
+    # The budget includes the initial population's evaluations
+    runner = Runner(pop, minEnergy, maxEvaluations, evaluations=pop.evaluations)
+    while runner.reason is None:
+        runner.run_slice(min(STOP_CHECK_STEPS, interval - runner.generation % interval))
+        if stopEvent.is_set():
+            runner.cancel()
+        if runner.generation % interval == 0:
+            message = pack_migrants(islandId, pop.get_best(migrants), moves)
+            for outbox in outboxes:
+                outbox.put(message)
+            while True:
+                try:
+                    data = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                for conf in unpack_migrants(data, prot)[1]:
+                    conf.setOfPoints = pop.collisionSet
+                    pop.add_immigrant(conf)
+
+    if pop.get_fittest().get_fitness() <= minEnergy:
+        stopEvent.set()
+    results.put((runner.evaluations, runner.generation, pack_migrants(islandId, [pop.get_fittest()], moves)))
+
+
+def run_islands(sequence=SEQUENCE, size=POPULATION_SIZE, mutProb=MUTATION_PROBABILITY,
+                crossProb=CROSSOVER_PROBABILITY, minEnergy=SWITCH_MIN_ENERGY,
+                maxEvaluations=SWITCH_MAX_EVALUATIONS, islands=ISLANDS,
+                interval=MIGRATION_INTERVAL, migrants=MIGRANTS, topology=TOPOLOGY, seed=SEED):
+    """
+    Run the GA as islands separate processes sharing the evaluation budget.
+    Returns the global fittest Conformation, the evaluations summed over all
+    islands and the per-island (fitness, evaluations, generations) results.
+    Raises RuntimeError if an island process dies before reporting.
+    """
+    neighbours(0, islands, topology)  # reject unknown topologies early
+    if minEnergy is None:
+        minEnergy = target_energy(Protein(sequence))[0]
+    ctx = mp.get_context()
+    inboxes = [ctx.Queue() for _ in range(islands)]
+    results = ctx.Queue()
+    stopEvent = ctx.Event()
+    params = (size, mutProb, crossProb, minEnergy, maxEvaluations // islands,
+              islands, interval, migrants, topology, seed)
+    workers = [ctx.Process(target=island, args=(i, sequence, params, inboxes, stopEvent, results))
+               for i in range(islands)]
+    for w in workers:
+        w.start()
+
+    prot = Protein(sequence)
+    fittest = None
+    totalEvaluations = 0
+    perIsland = [None] * islands
+    for _ in range(islands):
+        while True:
+            try:
+                evaluations, generations, data = results.get(timeout=RESULT_POLL_SECONDS)
+                break
+            except queue.Empty:
+                # An island that finished normally has posted its result before exiting
+                failed = [(i, w.exitcode) for i, w in enumerate(workers) if w.exitcode not in (None, 0)]
+                if failed:
+                    stopEvent.set()
+                    for w in workers:
+                        w.terminate()
+                        w.join()
+                    islandId, code = failed[0]
+                    raise RuntimeError(f"Island {islandId} exited with code {code}")
+        islandId, (best,) = unpack_migrants(data, prot)
+        totalEvaluations += evaluations
+        perIsland[islandId] = (best.get_fitness(), evaluations, generations)
+        if fittest is None or best.get_fitness() < fittest.get_fitness():
+            fittest = best
+    for w in workers:
+        w.join()
+    return fittest, totalEvaluations, perIsland
+
+
+def main():
+    print(f"Running {ISLANDS} islands ({TOPOLOGY}, migration every {MIGRATION_INTERVAL} steps) "
+          f"on sequence of length {len(SEQUENCE)}...")
+    fittest, evaluations, perIsland = run_islands()
+    for i, (fitness, evals, generations) in enumerate(perIsland):
+        print(f"Island {i}: BestEnergy={fitness}, Evaluations={evals}, Generations={generations}")
+    print("Global Fittest Individual:", fittest.getStatusString())
+    fittest.printAsciiPicture()
+    print("Optimal encoding:", fittest.getConformationString())
+    print("Total evaluations across islands:", evaluations)
+    bound = energy_lower_bound(Protein(SEQUENCE))
+    print(f"Lower bound on energy: {bound}, gap: {fittest.get_fitness() - bound}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,41 @@
 from Conformation import Conformation
 from Protein import Protein
 from Population import Population
+from ArrayPopulation import ArrayPopulation
+from Telemetry import Telemetry
+from Runner import Runner
+from Bounds import energy_lower_bound, target_energy
 
 # Global variables
-global_fittest_ptr = None
-isTerminated = False
-minimum_energy = -9
+# Energy to stop at; None stops at the sequence's known optimum (protein_sequence.txt) or else its lower bound
+minimum_energy = None
 max_evaluations = 100000
+# Offspring steps per call to ArrayPopulation.crossover_batch (0 = one crossover per call)
+offspring_batch_size = 0
+# Worker processes scoring each batch in shared memory (Population evalWorkers; needs offspring_batch_size)
+evaluation_workers = 0
+# Append a telemetry record every telemetry_every generations to this log (None = off)
+telemetry_path = None
+telemetry_every = 1000
+
+def print_improvement(improvement):
+    print(improvement.conformation.getStatusString())
+    improvement.conformation.printAsciiPicture()
 
 def calculation(pop: Population):
-    global global_fittest_ptr, isTerminated
-    global_fittest_ptr = pop.get_fittest()
+    telemetry = Telemetry(pop, telemetry_path, telemetry_every) if telemetry_path is not None else None
+    
+    stop = minimum_energy if minimum_energy is not None else target_energy(pop.protein)[0]
     
     # Continue until the fittest's fitness reaches threshold or max evaluations are exceeded.
-    while pop.get_fittest().get_fitness() > minimum_energy and Conformation.energyEvalSteps < max_evaluations:
-        pop.crossover()
-        
-        # Check if an improvement has been made.
-        if pop.get_fittest().get_fitness() < global_fittest_ptr.get_fitness():
-            global_fittest_ptr = pop.get_fittest()
-            print(global_fittest_ptr.getStatusString())
-            global_fittest_ptr.printAsciiPicture()
+    runner = Runner(pop, stop, max_evaluations, evaluations=pop.evaluations,
+                    batchSize=offspring_batch_size, telemetry=telemetry, bound=energy_lower_bound(pop.protein))
+    result = runner.run(print_improvement)
     
-    isTerminated = True
+    if telemetry is not None:
+        telemetry.close()
+    print(f"Stopped ({result.reason}) at energy {result.fitness}; lower bound {result.bound}, gap {result.gap}")
+    return result
 
 def main():
     # Seed the random number generator for reproducibility
@@ -35,13 +48,27 @@ def main():
     population_size = 10000
     mutation_probability = 0.05
     crossover_probability = 0.85
+    # Store the population as int8 encoding rows instead of Conformation objects
+    use_array_population = False
 
     
+    # The evaluation workers only score the children of crossover_batch
+    if evaluation_workers and not offspring_batch_size:
+        raise ValueError("evaluation_workers needs offspring_batch_size > 0")
+
     # Create the Population object
-    pop = Population(population_size, prot, mutation_probability, crossover_probability)
+    if use_array_population or (offspring_batch_size and not evaluation_workers):
+        pop = ArrayPopulation(population_size, prot, mutation_probability, crossover_probability)
+    else:
+        pop = Population(population_size, prot, mutation_probability, crossover_probability,
+                         evalWorkers=evaluation_workers)
     
     # Run the calculation loop
-    calculation(pop)
+    try:
+        calculation(pop)
+    finally:
+        if isinstance(pop, Population):
+            pop.close()
     
     # Output the final fittest individual
     fittest = pop.get_fittest()
@@ -9,13 +9,38 @@ if project_root not in sys.path:
 import unittest
 import random
 import copy
+import csv
+import itertools
+from array import array
+import tempfile
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
 import main
 
 from termcolor import colored
-from Conformation import Conformation
+from Conformation import Conformation, canonical_key, contact_energy, decode_walk, encode_positions, \
+    fused_walk, grow_walk, repair_walk, \
+    pack_encoding, packed_key, unpack_encoding
 from Protein import Protein
 from Population import Population
+from ArrayPopulation import ArrayPopulation, decode_batch, evaluate_batch
+from FitnessCache import FitnessCache
+from BloomFilter import BloomFilter
+from Checkpoint import Checkpointer, CheckpointFile, load_checkpoint
+from Telemetry import Telemetry, read_chunks, read_records
+from LocalSearch import LocalSearch, apply_moves, moved_contacts, pull_move
+from Runner import Runner
+from OperatorSelector import AdaptiveOperators
+from SharedEvaluator import SharedEvaluator
 from main import calculation
+import islands
+import testing
+import bays
+import benchmark
+import Bounds
+import batch
 from visual_utils import MutationVisualizer
 
 # Direction constants.
@@ -28,6 +53,8 @@ OPTIMAL_FITNESS = -9
 MUT_PROB = 0.19
 CROSS_PROB = 0.77
 POP_SIZE = 500
+MEDIUM_SEQUENCE = "WWWBBWWBBWWWWWBBBBBBBWWBBWWWWBBWWBWW"
+LONG_SEQUENCE = "BBBBWWWWBBBBBBBBBBBBWWWWWWBBBBBBBBBBBBWWWBBBBBBBBBBBBWWWBBBBBBBBBBBBWWWBWWBBWWBBWWBWB"
 
 
 class TestProtein(unittest.TestCase):
@@ -79,6 +106,24 @@ class TestConformation(unittest.TestCase):
         self.conf.calculate_absolute_position()
         self.assertEqual(len(self.conf.absPositions), len(SEQUENCE))
 
+    def test_chunked_decoder_matches_batch_decoder(self):
+        # Random encodings of every length up to a few chunks, colliding ones included
+        for moves in range(1, 30):
+            batch = np.array([[random.choice((LEFT, FORWARD, RIGHT)) for _ in range(moves)] for _ in range(5)],
+                             dtype=np.int8)
+            xs, ys = decode_batch(batch)
+            for row, encoding in enumerate(batch.tolist()):
+                self.assertEqual(decode_walk(array('b', encoding)), list(zip(xs[row].tolist(), ys[row].tolist())))
+        self.assertEqual(decode_walk([RIGHT, RIGHT, RIGHT]), [(0, 0), (0, 1), (1, 1), (1, 0), (0, 0)])
+
+    def test_is_corner_without_positions(self):
+        self.conf.generate_random_conformation(valid=True)
+        self.conf.calculate_absolute_position()
+        p = self.conf.absPositions
+        for i in range(1, self.conf.getLength() - 1):
+            straight = (p[i][0] - p[i-1][0], p[i][1] - p[i-1][1]) == (p[i+1][0] - p[i][0], p[i+1][1] - p[i][1])
+            self.assertEqual(self.conf.isCorner(i), not straight)
+
     def test_abs_at(self):
         self.conf.generate_random_conformation(valid=True)
         self.conf.calculate_absolute_position()
@@ -117,6 +162,202 @@ class TestConformation(unittest.TestCase):
         self.conf.calculate_validity(); self.conf.calculate_fitness()
         MutationVisualizer.print_conformation_pair(original, self.conf, "Crankshaft Mutation")
 
+    def test_fused_kernel_matches_reference(self):
+        # The fused kernel must agree with the separate walks and pairwise scoring.
+        prot = Protein(LONG_SEQUENCE)
+        conf = Conformation(prot, set())
+        for _ in range(200):
+            conf.generate_random_conformation(valid=False)
+            fused_valid = conf.evaluate()
+            conf.calculate_validity()
+            self.assertEqual(fused_valid, conf.isValid())
+        for _ in range(20):
+            self.conf.generate_random_conformation(valid=True)
+            self.assertTrue(self.conf.evaluate())
+            self.assertEqual(self.conf.get_fitness(), self.conf.pairwise_energy())
+
+    def test_delta_evaluation_matches_full_walk(self):
+        # Children evaluated against their parent's contacts must score like a full walk.
+        prot = Protein(MEDIUM_SEQUENCE)
+        p1 = Conformation(prot, set())
+        p2 = Conformation(prot, set())
+        p1.evaluate(); p2.evaluate()
+        for _ in range(300):
+            child = Conformation.crossover(p1, p2, set())
+            child.mutate(0.1)
+            valid = child.evaluate()
+            ref_valid, ref_fitness, ref_positions, _, _ = fused_walk(child.encoding, prot.getHydrophobic())
+            self.assertEqual(valid, ref_valid)
+            if valid:
+                self.assertEqual(child.get_fitness(), ref_fitness)
+                self.assertEqual(child.absPositions, ref_positions)
+                self.assertEqual(set(child.baseState[1]), set(ref_positions))
+                p1, p2 = child, p1
+
+    def test_copy_and_assign(self):
+        self.conf.evaluate()
+        clone = self.conf.copy()
+        self.assertEqual(clone.get_encoding(), self.conf.get_encoding())
+        self.assertIsNot(clone.get_encoding(), self.conf.get_encoding())
+        self.assertFalse(hasattr(clone, "__dict__"))
+        clone.mutate_directed(1.0)
+        self.assertNotEqual(clone.get_encoding(), self.conf.get_encoding())
+        buffer = self.conf.get_encoding()
+        self.conf.assign(clone)
+        self.assertIs(self.conf.get_encoding(), buffer)
+        self.assertEqual(self.conf.get_encoding(), clone.get_encoding())
+
+    def test_pack_encoding_roundtrip(self):
+        for moves in range(0, 9):
+            for _ in range(10):
+                enc = [random.randint(-1, 1) for _ in range(moves)]
+                packed = pack_encoding(enc)
+                self.assertEqual(len(packed), (moves + 3) // 4)
+                self.assertEqual(unpack_encoding(packed, moves), enc)
+
+    def test_fitness_cache(self):
+        self.conf.generate_random_conformation(valid=True)
+        Conformation.fitnessCache = FitnessCache(2)
+        try:
+            self.conf.evaluate()
+            fitness = self.conf.get_fitness()
+            steps = Conformation.energyEvalSteps
+            self.assertTrue(self.conf.evaluate())
+            self.assertEqual(Conformation.energyEvalSteps, steps)
+            self.assertEqual(self.conf.get_fitness(), fitness)
+            self.assertEqual((Conformation.fitnessCache.hits, Conformation.fitnessCache.misses), (1, 1))
+            # Positions are decoded again when needed after a hit
+            self.assertEqual(self.conf.getAbsAt(0), (0, 0))
+            self.conf.printAsciiPicture()
+        finally:
+            Conformation.fitnessCache = None
+
+    def test_fitness_cache_separates_proteins(self):
+        # Two proteins of the same length folded the same way must not share entries
+        other = Protein("".join("W" if c == "B" else "B" for c in SEQUENCE))
+        self.conf.generate_random_conformation(valid=True)
+        twin = self.conf.copy()
+        twin.protein = other
+        twin.evaluate()
+        expected = twin.get_fitness()
+        Conformation.fitnessCache = FitnessCache(4)
+        try:
+            self.conf.evaluate()
+            twin.fitness = None
+            self.assertTrue(twin.evaluate())
+            self.assertEqual(twin.get_fitness(), expected)
+            self.assertEqual(Conformation.fitnessCache.hits, 0)
+        finally:
+            Conformation.fitnessCache = None
+
+    def test_fitness_cache_eviction(self):
+        cache = FitnessCache(2)
+        cache.put(b"a", True, -1)
+        cache.put(b"b", True, -2)
+        self.assertEqual(cache.get(b"a"), (True, -1))
+        cache.put(b"c", False, 0)
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertAlmostEqual(cache.hit_rate(), 0.5)
+
+    def test_canonical_key_of_mirror_image(self):
+        for moves in range(0, 9):
+            for _ in range(10):
+                enc = [random.randint(-1, 1) for _ in range(moves)]
+                mirror = [-d for d in enc]
+                self.assertEqual(canonical_key(enc), canonical_key(mirror))
+                self.assertEqual(canonical_key(enc), min(packed_key(enc), packed_key(mirror)))
+        self.conf.generate_random_conformation(valid=True)
+        self.conf.evaluate()
+        mirror = self.conf.copy()
+        mirror.encoding = type(mirror.encoding)('b', (-d for d in self.conf.encoding))
+        mirror.evaluate()
+        self.assertEqual(mirror.get_fitness(), self.conf.get_fitness())
+        # With canonical cache keys the mirror image hits the entry of the original
+        Conformation.fitnessCache = FitnessCache(2)
+        Conformation.canonicalCacheKeys = True
+        try:
+            self.conf.evaluate()
+            self.assertTrue(mirror.evaluate())
+            self.assertEqual(Conformation.fitnessCache.hits, 1)
+            self.assertEqual(mirror.get_fitness(), self.conf.get_fitness())
+        finally:
+            Conformation.fitnessCache = None
+            Conformation.canonicalCacheKeys = False
+
+    def test_pull_moves_keep_walk_valid_and_score_incrementally(self):
+        hydrophobic = Protein(MEDIUM_SEQUENCE).getHydrophobic()
+        n = len(hydrophobic)
+        moved = 0
+        for _ in range(20):
+            encoding = grow_walk(n)[0]
+            positions = list(fused_walk(encoding, hydrophobic)[2])
+            occupied = {pos: k for k, pos in enumerate(positions)}
+            fitness = contact_energy(positions, hydrophobic)
+            for _ in range(50):
+                moves = pull_move(positions, occupied, random.randrange(n), random.choice((1, -1)),
+                                  random.choice((1, -1)))
+                if moves is None:
+                    continue
+                moved += 1
+                lost = moved_contacts(positions, occupied, moves, hydrophobic)
+                apply_moves(positions, occupied, moves)
+                fitness += lost - moved_contacts(positions, occupied, moves, hydrophobic)
+                self.assertEqual(len(set(positions)), n)
+                self.assertEqual(fitness, contact_energy(positions, hydrophobic))
+                self.assertEqual(fused_walk(encode_positions(positions), hydrophobic)[1], fitness)
+        self.assertGreater(moved, 0)
+
+    def test_repair_regrows_colliding_suffix(self):
+        hydrophobic = Protein(MEDIUM_SEQUENCE).getHydrophobic()
+        n = len(hydrophobic)
+        repaired = 0
+        for _ in range(50):
+            encoding = array('b', grow_walk(n)[0])
+            # Splice in a suffix that folds back onto the walk
+            cut = random.randrange(n - 6)
+            encoding[cut:cut + 3] = array('b', (RIGHT, RIGHT, RIGHT))
+            valid, _, positions, _, _ = fused_walk(encoding, hydrophobic, score=False)
+            result, start = repair_walk(encoding)
+            if valid:
+                self.assertEqual((list(result), start), (list(encoding), None))
+                continue
+            if result is None:
+                continue
+            repaired += 1
+            self.assertEqual(start, len(positions) - 2)
+            self.assertEqual(result[:start], encoding[:start])
+            self.assertTrue(fused_walk(result, hydrophobic, score=False)[0])
+        self.assertGreater(repaired, 0)
+
+    def test_local_search_budget(self):
+        self.conf.generate_random_conformation(valid=True)
+        self.conf.evaluate()
+        before = self.conf.get_fitness()
+        steps = Conformation.energyEvalSteps
+        search = LocalSearch(30)
+        gain = search.run(self.conf)
+        self.assertLessEqual(search.evaluations, 30)
+        self.assertEqual(Conformation.energyEvalSteps, steps + search.evaluations)
+        self.assertEqual(self.conf.get_fitness(), before + gain)
+        self.assertEqual(self.conf.get_fitness(), self.conf.pairwise_energy())
+        self.assertTrue(self.conf.evaluate())
+        self.assertEqual(self.conf.get_fitness(), before + gain)
+
+    def test_fused_kernel_fallback_flag(self):
+        self.conf.generate_random_conformation(valid=True)
+        self.conf.evaluate()
+        fused = self.conf.get_fitness()
+        Conformation.useFusedKernel = False
+        try:
+            steps = Conformation.energyEvalSteps
+            self.assertTrue(self.conf.evaluate())
+            self.assertEqual(Conformation.energyEvalSteps, steps + 1)
+        finally:
+            Conformation.useFusedKernel = True
+        self.assertEqual(self.conf.get_fitness(), fused)
+
 
 class TestPopulation(unittest.TestCase):
     def setUp(self):
@@ -141,11 +382,279 @@ class TestPopulation(unittest.TestCase):
         print(f"\n[Population] isInsertable(same) = {ok}")
         self.assertFalse(ok)
 
+    def test_dedup_index_tracks_live_individuals(self):
+        for _ in range(300):
+            self.pop.crossover()
+        keys = {indiv.getPackedKey() for indiv in self.pop.individuals}
+        self.assertEqual(len(keys), POP_SIZE)
+        self.assertEqual(self.pop.setOfConformations, keys)
+        self.assertGreaterEqual(self.pop.insertedCount, POP_SIZE)
+
+    def test_canonical_keys_reject_mirror_images(self):
+        pop = Population(50, self.prot, MUT_PROB, CROSS_PROB, canonicalKeys=True)
+        mirror = pop.individuals[0].copy()
+        mirror.encoding = type(mirror.encoding)('b', (-d for d in mirror.encoding))
+        self.assertFalse(pop.is_insertable(mirror))
+        self.assertTrue(pop.is_known(mirror))
+        self.assertEqual(pop.symmetrySkips, 1)
+        for _ in range(200):
+            pop.crossover()
+        keys = {indiv.getCanonicalKey() for indiv in pop.individuals}
+        self.assertEqual(len(keys), 50)
+        self.assertEqual(pop.setOfConformations, keys)
+
+    def test_local_search_on_offspring(self):
+        pop = Population(50, self.prot, MUT_PROB, CROSS_PROB, localSearchBudget=20)
+        for _ in range(100):
+            pop.crossover()
+        self.assertGreater(pop.localSearch.calls, 0)
+        self.assertLessEqual(pop.localSearch.evaluations, 20 * pop.localSearch.calls)
+        for indiv in pop.individuals:
+            self.assertEqual(indiv.get_fitness(), contact_energy(fused_walk(
+                indiv.get_encoding(), self.prot.getHydrophobic())[2], self.prot.getHydrophobic()))
+        self.assertEqual(pop.setOfConformations, {indiv.getPackedKey() for indiv in pop.individuals})
+
+    def test_repair_saves_colliding_children(self):
+        pop = Population(50, self.prot, MUT_PROB, CROSS_PROB, repairCollisions=True)
+        for _ in range(200):
+            pop.crossover()
+        self.assertGreater(pop.repairSaved, 0)
+        self.assertLessEqual(pop.repairSaved, pop.repairAttempts)
+        self.assertAlmostEqual(pop.repaired_fraction(), pop.repairSaved / pop.offspringCount)
+        for indiv in pop.individuals:
+            valid, fitness, _, _, _ = fused_walk(indiv.get_encoding(), self.prot.getHydrophobic())
+            self.assertTrue(valid)
+            self.assertEqual(indiv.get_fitness(), fitness)
+
+    def test_crossover_batch_with_shared_evaluator(self):
+        runs = []
+        for workers in (0, 2):
+            random.seed(11)
+            Conformation.energyEvalSteps = 0
+            pop = Population(50, self.prot, MUT_PROB, CROSS_PROB, evalWorkers=workers)
+            try:
+                for _ in range(20):
+                    pop.crossover_batch(16)
+            finally:
+                pop.close()
+            for indiv in pop.individuals:
+                valid, fitness, _, _, _ = fused_walk(indiv.get_encoding(), self.prot.getHydrophobic())
+                self.assertTrue(valid)
+                self.assertEqual(indiv.get_fitness(), fitness)
+            self.assertEqual(pop.setOfConformations, {indiv.getPackedKey() for indiv in pop.individuals})
+            runs.append(([list(indiv.get_encoding()) for indiv in pop.individuals], Conformation.energyEvalSteps))
+        # Evaluating in the workers changes nothing but where the work is done
+        self.assertEqual(runs[0], runs[1])
+
+    def test_shared_evaluator_matches_fused_walk(self):
+        hydrophobic = self.prot.getHydrophobic()
+        moves = len(hydrophobic) - 2
+        encodings = [array('b', grow_walk(len(hydrophobic))[0]) for _ in range(20)] + \
+                    [array('b', (random.choice((LEFT, FORWARD, RIGHT)) for _ in range(moves))) for _ in range(20)]
+        with SharedEvaluator(self.prot, 2, capacity=16) as evaluator:
+            valid, fitness = evaluator.evaluate(encodings)
+        for encoding, ok, energy in zip(encodings, valid, fitness):
+            expected, expectedFitness, _, _, _ = fused_walk(encoding, hydrophobic)
+            self.assertEqual(ok, expected)
+            if ok:
+                self.assertEqual(energy, expectedFitness)
+
+    def test_shared_evaluator_dead_worker_raises(self):
+        encodings = [array('b', grow_walk(len(SEQUENCE))[0]) for _ in range(8)]
+        with SharedEvaluator(self.prot, 2, capacity=16) as evaluator:
+            for process in evaluator.processes:
+                process.kill()
+                process.join()
+            with self.assertRaises(RuntimeError):
+                evaluator.evaluate(encodings)
+
+    def test_adaptive_operators_follow_rewards(self):
+        operators = AdaptiveOperators(rand=random.Random(1))
+        for _ in range(100):
+            operators.update("directed", "accepted")
+            operators.update("corner_flip", "invalid")
+            operators.update("crankshaft", "rejected")
+        probabilities = operators.probabilities
+        self.assertAlmostEqual(sum(probabilities.values()), 1.0)
+        self.assertGreater(probabilities["directed"], 0.75)
+        self.assertGreaterEqual(min(probabilities.values()), operators.minProbability - 1e-9)
+        drawn = [operators.choose() for _ in range(2000)]
+        self.assertGreater(drawn.count("directed"), 1400)
+        credit = operators.credit()
+        self.assertEqual((credit["corner_flip"]["uses"], credit["corner_flip"]["valid"]), (100, 0))
+        self.assertEqual((credit["crankshaft"]["new"], credit["crankshaft"]["accepted"]), (100, 0))
+        operators.update("directed", "unchanged")
+        self.assertEqual((operators.uses["directed"], operators.valid["directed"]), (101, 100))
+
+    def test_adaptive_operators_in_population(self):
+        pop = Population(50, self.prot, MUT_PROB, CROSS_PROB, adaptiveOperators=True)
+        for _ in range(300):
+            pop.crossover()
+        credit = pop.operators.credit()
+        # Every child is credited, including those the chosen operator left unchanged
+        self.assertEqual(sum(c["uses"] for c in credit.values()), pop.offspringCount)
+        self.assertGreater(sum(c["accepted"] for c in credit.values()), 0)
+        for c in credit.values():
+            self.assertTrue(c["uses"] >= c["valid"] >= c["new"] >= c["accepted"])
+        self.assertAlmostEqual(sum(c["probability"] for c in credit.values()), 1.0)
+
+    def test_adaptive_operators_drop_a_no_op(self):
+        # An operator that never changes a child earns nothing, even when crossover
+        # alone makes its children accepted
+        with mock.patch.object(Conformation, "mutate_crankshaft", lambda conf, probability: None):
+            pop = Population(50, self.prot, MUT_PROB, CROSS_PROB, adaptiveOperators=True)
+            for _ in range(500):
+                pop.crossover()
+        credit = pop.operators.credit()
+        self.assertGreater(credit["crankshaft"]["uses"], 0)
+        self.assertEqual(credit["crankshaft"]["valid"], 0)
+        self.assertEqual(credit["crankshaft"]["quality"], 0.0)
+        self.assertAlmostEqual(credit["crankshaft"]["probability"], pop.operators.minProbability)
+
+    def test_fitness_index_tracks_replacements(self):
+        for _ in range(300):
+            self.pop.crossover()
+        index = self.pop.fitnessIndex
+        self.assertEqual([indiv.get_fitness() for indiv in index.ranked],
+                         sorted(indiv.get_fitness() for indiv in self.pop.individuals))
+        self.assertEqual({id(indiv) for indiv in index.ranked}, {id(indiv) for indiv in self.pop.individuals})
+        for fitness in index.levels:
+            block = index.ranked[index.start[fitness]:index.start[fitness] + index.count[fitness]]
+            self.assertTrue(all(indiv.get_fitness() == fitness for indiv in block))
+        self.assertEqual(self.pop.get_fittest().get_fitness(), index.best().get_fitness())
+
+    def test_tournament_keeps_selection_pressure(self):
+        # Winner fitness distribution of the index against sampling the individuals directly
+        draws = 30000
+        direct = {}
+        indexed = {}
+        for _ in range(draws):
+            fitness = min(random.sample(self.pop.individuals, 3), key=lambda indiv: indiv.get_fitness()).get_fitness()
+            direct[fitness] = direct.get(fitness, 0) + 1
+            fitness = self.pop.tournament_select().get_fitness()
+            indexed[fitness] = indexed.get(fitness, 0) + 1
+        for fitness in set(direct) | set(indexed):
+            self.assertLess(abs(direct.get(fitness, 0) - indexed.get(fitness, 0)) / draws, 0.015)
+
+    def test_rank_and_roulette_selection(self):
+        for selection in ("rank", "roulette"):
+            pop = Population(50, self.prot, MUT_PROB, CROSS_PROB, selection=selection)
+            for _ in range(100):
+                pop.crossover()
+            picks = [pop.select().get_fitness() for _ in range(2000)]
+            mean = sum(indiv.get_fitness() for indiv in pop.individuals) / 50
+            # Both favour fitter (lower energy) individuals
+            self.assertLess(sum(picks) / len(picks), mean)
+        with self.assertRaises(ValueError):
+            Population(50, self.prot, MUT_PROB, CROSS_PROB, selection="random")
+
+    def test_history_filter(self):
+        pop = Population(50, self.prot, MUT_PROB, CROSS_PROB, historyBits=1 << 14)
+        for _ in range(100):
+            pop.crossover()
+        self.assertGreaterEqual(pop.historyFilter.count, 50)
+        self.assertLess(pop.history_false_positive_rate(), 0.01)
+        self.assertEqual(self.pop.history_false_positive_rate(), 0.0)
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(4096, 3)
+        for key in range(0, 600, 2):
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in range(0, 600, 2)))
+        false_positives = sum(key in bloom for key in range(1, 6001, 2)) / 3000
+        self.assertLess(abs(false_positives - bloom.false_positive_rate()), 0.03)
+
+    def test_grow_initializer(self):
+        prot = Protein(LONG_SEQUENCE)
+        for workers in (1, 2):
+            pop = Population(40, prot, MUT_PROB, CROSS_PROB, workers=workers)
+            self.assertEqual(len(pop.individuals), 40)
+            self.assertEqual(len(pop.setOfConformations), 40)
+            for indiv in pop.individuals:
+                self.assertTrue(indiv.isValid())
+                self.assertEqual(indiv.get_fitness(), indiv.pairwise_energy())
+            self.assertGreaterEqual(pop.initRejected, 0)
+        with self.assertRaises(ValueError):
+            Population(5, prot, MUT_PROB, CROSS_PROB, initMethod="unknown")
+
+    def test_random_initializer(self):
+        pop = Population(20, self.prot, MUT_PROB, CROSS_PROB, initMethod="random")
+        self.assertEqual(len(pop.individuals), 20)
+
+    def test_metrics(self):
+        self.assertIsNone(self.pop.metrics_snapshot())
+        offspring, inserted = self.pop.offspringCount, self.pop.insertedCount
+        self.pop.enable_metrics()
+        for _ in range(200):
+            self.pop.crossover()
+        snap = self.pop.metrics_snapshot()
+        children = sum(counts["invalid"] + counts["duplicate"] + counts["rejected"] + counts["accepted"]
+                       for counts in snap["operators"].values())
+        self.assertGreater(children, 0)
+        # Every child is counted once by its final outcome
+        self.assertEqual(children, self.pop.offspringCount - offspring)
+        self.assertEqual(sum(counts["accepted"] for counts in snap["operators"].values()),
+                         self.pop.insertedCount - inserted)
+        self.assertLessEqual(set(snap["operators"]), {"directed", "corner_flip", "crankshaft"})
+        self.assertIn("evaluate", snap["phaseSeconds"])
+        self.assertGreater(snap["evaluations"], 0)
+        self.pop.disable_metrics()
+        self.assertIsNone(self.pop.metrics_snapshot())
+        self.pop.crossover()
+
+    def test_metrics_count_own_evaluations(self):
+        pops = [Population(30, self.prot, MUT_PROB, CROSS_PROB) for _ in range(2)]
+        starts = [pop.evaluations for pop in pops]
+        for pop in pops:
+            pop.enable_metrics()
+        for _ in range(100):
+            for pop in pops:
+                pop.crossover()
+        for pop, start in zip(pops, starts):
+            self.assertEqual(pop.metrics_snapshot()["evaluations"], pop.evaluations - start)
+
+    def test_metrics_count_every_improvement(self):
+        random.seed(3)
+        pop = Population(40, Protein(MEDIUM_SEQUENCE), MUT_PROB, CROSS_PROB)
+        pop.enable_metrics()
+        improvements = 0
+        for _ in range(1000):
+            best = pop.get_fittest().get_fitness()
+            pop.crossover()
+            improvements += pop.get_fittest().get_fitness() < best
+        # Both children of a step may improve on the best, so a step counts once or twice
+        improving = sum(counts["improving"] for counts in pop.metrics_snapshot()["operators"].values())
+        self.assertGreater(improvements, 0)
+        self.assertTrue(improvements <= improving <= 2 * improvements)
+
+    def test_metrics_do_not_change_the_run(self):
+        runs = []
+        for metrics in (False, True):
+            random.seed(11)
+            pop = Population(40, self.prot, MUT_PROB, CROSS_PROB, repairCollisions=True)
+            if metrics:
+                pop.enable_metrics()
+            for _ in range(100):
+                pop.crossover()
+            pop.crossover_batch(20)
+            runs.append([list(indiv.get_encoding()) for indiv in pop.individuals])
+        self.assertEqual(runs[0], runs[1])
+        snap = pop.metrics_snapshot()
+        self.assertGreater(sum(counts["repaired"] for counts in snap["operators"].values()), 0)
+
     def test_tournament_selection(self):
         sel = self.pop.tournament_select()
         print(f"\n[Population] tournamentSelect -> fitness={sel.get_fitness()}")
         self.assertIn(sel, self.pop.individuals)
 
+    def test_tournament_larger_than_population(self):
+        pop = Population(2, self.prot, MUT_PROB, CROSS_PROB)
+        self.assertIn(pop.tournament_select(2), pop.individuals)
+        with self.assertRaises(ValueError):
+            pop.tournament_select(3)
+        with self.assertRaises(ValueError):
+            pop.crossover()
+
     def test_crossover_function(self):
         pre = self.pop.get_fittest().get_fitness()
         self.pop.crossover()
@@ -156,8 +665,9 @@ class TestPopulation(unittest.TestCase):
     def test_crossover_visualization(self):
         # Select two real parents
         random.seed(42)
-        p1 = copy.deepcopy(self.pop.tournament_select())
-        p2 = copy.deepcopy(self.pop.tournament_select())
+        # Parents drawn as tournament_select did before the fitness index, to keep this seeded example
+        p1 = copy.deepcopy(min(random.sample(self.pop.individuals, 3), key=lambda indiv: indiv.get_fitness()))
+        p2 = copy.deepcopy(min(random.sample(self.pop.individuals, 3), key=lambda indiv: indiv.get_fitness()))
         # Guarantee distinct
         if p1.get_encoding() == p2.get_encoding():
             p2.mutate_directed(1.0)
@@ -231,6 +741,427 @@ class TestPopulation(unittest.TestCase):
 
         self.assertLessEqual(child.get_fitness(), min(p1.get_fitness(), p2.get_fitness()))
 
+    def test_add_immigrant(self):
+        worst = self.pop.fitnessIndex.worst()
+        self.assertEqual(worst.get_fitness(), max(indiv.get_fitness() for indiv in self.pop.individuals))
+        immigrant = copy.deepcopy(self.pop.get_fittest())
+        immigrant.mutate_directed(1.0)
+        immigrant.evaluate()
+        immigrant.fitness = worst.get_fitness() - 1
+        self.assertTrue(self.pop.add_immigrant(immigrant))
+        self.assertEqual(list(worst.get_encoding()), list(immigrant.get_encoding()))
+        self.assertFalse(self.pop.add_immigrant(copy.deepcopy(immigrant)))
+
+
+
+class TestArrayPopulation(unittest.TestCase):
+    def setUp(self):
+        random.seed(42)
+        self.prot = Protein(SEQUENCE)
+        self.pop = ArrayPopulation(POP_SIZE, self.prot, MUT_PROB, CROSS_PROB, seed=42)
+
+    def test_population_initialization(self):
+        self.assertEqual(self.pop.encodings.shape, (POP_SIZE, len(SEQUENCE) - 2))
+        self.assertEqual(self.pop.encodings.dtype.name, "int8")
+        self.assertEqual(len(self.pop.setOfConformations), POP_SIZE)
+        self.assertTrue((self.pop.fitness < 0).all())
+
+    def test_individual_matches_row(self):
+        conf = self.pop.individual(7)
+        self.assertEqual(conf.get_encoding().tolist(), self.pop.encodings[7].tolist())
+        self.assertTrue(conf.isValid())
+        self.assertEqual(conf.get_fitness(), conf.pairwise_energy())
+
+    def test_fittest_selection(self):
+        self.assertEqual(self.pop.get_fittest().get_fitness(), self.pop.fitness.min())
+
+    def test_row_mutations_keep_moves(self):
+        row = self.pop.encodings[0].copy()
+        for _ in range(50):
+            self.pop.mutate_row(row, 0.5)
+            self.assertTrue(set(row.tolist()) <= {LEFT, FORWARD, RIGHT})
+
+    def test_crossover_function(self):
+        pre = self.pop.get_fittest().get_fitness()
+        for _ in range(200):
+            self.pop.crossover()
+        post = self.pop.get_fittest().get_fitness()
+        self.assertLessEqual(post, pre)
+        self.assertEqual(post, self.pop.fitness.min())
+        for i in range(0, POP_SIZE, 50):
+            conf = self.pop.individual(i)
+            self.assertEqual(conf.get_fitness(), conf.pairwise_energy())
+
+    def test_evaluate_batch_matches_fused_kernel(self):
+        prot = Protein(MEDIUM_SEQUENCE)
+        rng = np.random.default_rng(1)
+        encodings = rng.integers(-1, 2, (500, len(MEDIUM_SEQUENCE) - 2)).astype(np.int8)
+        valid, fitness = evaluate_batch(encodings, prot.getHydrophobic())
+        for row, ok, fit in zip(encodings, valid, fitness):
+            ref_valid, ref_fitness, _, _, _ = fused_walk(row.tolist(), prot.getHydrophobic())
+            self.assertEqual(bool(ok), ref_valid)
+            if ref_valid:
+                self.assertEqual(int(fit), ref_fitness)
+
+    def test_crossover_batch(self):
+        pre = self.pop.get_fittest().get_fitness()
+        steps = Conformation.energyEvalSteps
+        for _ in range(5):
+            self.pop.crossover_batch(64)
+        self.assertGreater(Conformation.energyEvalSteps, steps)
+        self.assertLessEqual(self.pop.get_fittest().get_fitness(), pre)
+        self.assertEqual(self.pop.get_fittest().get_fitness(), self.pop.fitness.min())
+        for i in range(0, POP_SIZE, 50):
+            conf = self.pop.individual(i)
+            self.assertTrue(conf.isValid())
+            self.assertEqual(conf.get_fitness(), conf.pairwise_energy())
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        random.seed(7)
+        self.prot = Protein(MEDIUM_SEQUENCE)
+        self.pop = Population(60, self.prot, MUT_PROB, CROSS_PROB, historyBits=1 << 12,
+                              canonicalKeys=True, localSearchBudget=10, selection="rank", repairCollisions=True,
+                              adaptiveOperators=True)
+        for _ in range(50):
+            self.pop.crossover()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "run.ckpt")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    @staticmethod
+    def state(pop):
+        return ([(list(indiv.get_encoding()), indiv.get_fitness(), indiv.get_generation()) for indiv in pop.individuals],
+                pop.get_fittest().get_fitness(), pop.insertedCount, pop.offspringCount, pop.symmetrySkips, pop.historyFilter.count,
+                pop.localSearch.evaluations, pop.repairSaved, pop.operators.credit(), pop.evaluations)
+
+    def test_resume_continues_as_if_uninterrupted(self):
+        checkpointer = Checkpointer(self.path, 1)
+        checkpointer.step(self.pop)
+        checkpointer.wait()
+        for _ in range(200):
+            self.pop.crossover()
+        uninterrupted = self.state(self.pop)
+
+        random.seed(99)
+        Conformation.energyEvalSteps = 0
+        resumed = load_checkpoint(self.path)
+        self.assertEqual(resumed.setOfConformations, {indiv.getCanonicalKey() for indiv in resumed.individuals})
+        for _ in range(200):
+            resumed.crossover()
+        self.assertEqual(self.state(resumed), uninterrupted)
+
+    def test_records_are_readable_from_the_mapped_file(self):
+        checkpointer = Checkpointer(self.path, 10)
+        for _ in range(25):
+            checkpointer.step(self.pop)
+        checkpointer.wait()
+        self.assertEqual(checkpointer.saved, 2)
+        with CheckpointFile(self.path) as ckpt:
+            self.assertEqual((ckpt.sequence, ckpt.size), (MEDIUM_SEQUENCE, 60))
+            for i in (0, 31, 59):
+                indiv = self.pop.individuals[i]
+                self.assertEqual(ckpt.record(i), (indiv.get_fitness(), indiv.get_generation(), indiv.get_encoding()))
+        with open(self.path, "r+b") as file:
+            file.write(b"XXXX")
+        with self.assertRaises(ValueError):
+            load_checkpoint(self.path)
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        random.seed(3)
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "run.hptl")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_stream_records(self):
+        pop = Population(60, Protein(SEQUENCE), MUT_PROB, CROSS_PROB)
+        start = pop.evaluations
+        telemetry = Telemetry(pop, self.path, every=10, chunkRows=4)
+        for generation in range(1, 101):
+            pop.crossover()
+            telemetry.step(generation)
+        telemetry.close()
+        self.assertTrue(all(len(chunk["best"]) <= 4 for chunk in read_chunks(self.path)))
+        records = list(read_records(self.path))
+        self.assertEqual([r["generation"] for r in records], list(range(10, 101, 10)))
+        last = records[-1]
+        fitness = sorted(indiv.get_fitness() for indiv in pop.individuals)
+        self.assertEqual((last["best"], last["median"]), (fitness[0], fitness[59 // 2]))
+        self.assertLessEqual(last["q10"], last["median"])
+        self.assertLessEqual(last["median"], last["q90"])
+        self.assertTrue(0.0 <= last["diversity"] <= 1.585)
+        self.assertEqual(sum(r["accepted"] + r["rejected"] for r in records), pop.offspringCount)
+        self.assertEqual(sum(r["accepted"] for r in records), pop.insertedCount - 60)
+        self.assertEqual(last["evaluations"], pop.evaluations - start)
+
+    def test_immigrants_are_not_children(self):
+        random.seed(3)
+        pop = Population(30, Protein(MEDIUM_SEQUENCE), MUT_PROB, CROSS_PROB)
+        donor = Population(30, Protein(MEDIUM_SEQUENCE), MUT_PROB, CROSS_PROB)
+        telemetry = Telemetry(pop, self.path, every=1)
+        immigrants = 0
+        for generation in range(1, 51):
+            pop.crossover()
+            immigrants += pop.add_immigrant(donor.get_best(generation % 30 + 1)[-1].copy())
+            telemetry.step(generation)
+        telemetry.close()
+        records = list(read_records(self.path))
+        self.assertGreater(immigrants, 0)
+        self.assertTrue(all(r["rejected"] >= 0 for r in records))
+        self.assertEqual(sum(r["accepted"] + r["rejected"] for r in records), pop.offspringCount)
+        self.assertEqual(sum(r["accepted"] for r in records), pop.insertedCount - 30 - immigrants)
+
+    def test_log_is_append_only(self):
+        pop = ArrayPopulation(40, Protein(SEQUENCE), MUT_PROB, CROSS_PROB, seed=1)
+        for start in (0, 5):
+            telemetry = Telemetry(pop, self.path, every=1)
+            for generation in range(start + 1, start + 6):
+                pop.crossover()
+                telemetry.step(generation)
+            telemetry.close()
+        records = list(read_records(self.path))
+        self.assertEqual([r["generation"] for r in records], list(range(1, 11)))
+        self.assertEqual(records[-1]["best"], pop.get_fittest().get_fitness())
+
+
+class TestRunner(unittest.TestCase):
+    def make_population(self, seed=7):
+        random.seed(seed)
+        return Population(POP_SIZE, Protein(SEQUENCE), MUT_PROB, CROSS_PROB)
+
+    def test_run_reports_improvements(self):
+        pop = self.make_population()
+        found = []
+        result = Runner(pop, OPTIMAL_FITNESS, 20000).run(found.append)
+        self.assertIn(result.reason, ("optimum", "evaluations"))
+        self.assertEqual(result.fitness, pop.get_fittest().get_fitness())
+        self.assertEqual([i.fitness for i in found], sorted([i.fitness for i in found], reverse=True))
+        if found:
+            self.assertEqual(found[-1].fitness, result.fitness)
+            self.assertEqual(found[-1].evaluations, result.evaluationsToBest)
+        self.assertLessEqual(result.evaluationsToBest, result.evaluations)
+
+    def test_evaluation_budget(self):
+        pop = self.make_population()
+        result = Runner(pop, -1000, 3000).run()
+        self.assertEqual(result.reason, "evaluations")
+        self.assertGreaterEqual(result.evaluations, 3000)
+        self.assertLess(result.evaluations, 3000 + 3)
+
+    def test_concurrent_runs_count_their_own_evaluations(self):
+        pops = [self.make_population(seed) for seed in (1, 2)]
+        initial = [pop.evaluations for pop in pops]
+        runners = [Runner(pop, -1000, 3000, sliceSteps=10) for pop in pops]
+
+        async def scenario():
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                return await asyncio.gather(*(runner.run_in_executor(executor) for runner in runners))
+
+        for result, pop, start in zip(asyncio.run(scenario()), pops, initial):
+            self.assertEqual(result.reason, "evaluations")
+            self.assertEqual(result.evaluations, pop.evaluations - start)
+            self.assertLess(result.evaluations, 3000 + 3)
+
+    def test_async_stream_and_cancel(self):
+        pops = [self.make_population(seed) for seed in (1, 2)]
+        runners = [Runner(pop, -1000, 10 ** 9, sliceSteps=50) for pop in pops]
+
+        async def scenario():
+            tasks = [asyncio.create_task(runner.run_async()) for runner in runners]
+            # Both runs make progress on one event loop until they are cancelled
+            while min(runner.generation for runner in runners) < 200:
+                await asyncio.sleep(0)
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        asyncio.run(scenario())
+        for runner, pop in zip(runners, pops):
+            result = runner.result()
+            self.assertEqual(result.reason, "cancelled")
+            self.assertGreaterEqual(result.generations, 200)
+            self.assertEqual(result.fitness, pop.get_fittest().get_fitness())
+
+    def test_deadline(self):
+        result = asyncio.run(Runner(self.make_population(), -1000, 10 ** 9, deadline=0.2).run_async())
+        self.assertEqual(result.reason, "deadline")
+        self.assertGreaterEqual(result.seconds, 0.2)
+
+    def test_run_in_executor_cancel(self):
+        runner = Runner(self.make_population(), -1000, 10 ** 9)
+
+        async def scenario():
+            with ThreadPoolExecutor(1) as executor:
+                task = asyncio.create_task(runner.run_in_executor(executor))
+                await asyncio.sleep(0.1)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            # Leaving the executor waited for the thread, which stopped on cancel
+            self.assertEqual(runner.reason, "cancelled")
+
+        asyncio.run(scenario())
+
+
+class TestIslands(unittest.TestCase):
+    def test_migrant_wire_format(self):
+        random.seed(42)
+        prot = Protein(SEQUENCE)
+        confs = [Conformation(prot, set()) for _ in range(3)]
+        for conf in confs:
+            conf.evaluate()
+        data = islands.pack_migrants(5, confs, len(SEQUENCE) - 2)
+        islandId, decoded = islands.unpack_migrants(data, prot)
+        self.assertEqual(islandId, 5)
+        for conf, back in zip(confs, decoded):
+            self.assertEqual(back.get_encoding(), conf.get_encoding())
+            self.assertEqual(back.get_fitness(), conf.get_fitness())
+            self.assertTrue(back.isValid())
+
+    def test_run_islands(self):
+        fittest, evaluations, per_island = islands.run_islands(
+            sequence=SEQUENCE, size=100, minEnergy=OPTIMAL_FITNESS, maxEvaluations=4000,
+            islands=2, interval=200, topology="all")
+        self.assertEqual(len(per_island), 2)
+        self.assertEqual(evaluations, sum(evals for _, evals, _ in per_island))
+        self.assertEqual(fittest.get_fitness(), min(fit for fit, _, _ in per_island))
+        self.assertEqual(fittest.get_fitness(), fittest.pairwise_energy())
+
+    def test_dead_island_raises(self):
+        # A single individual cannot hold a tournament, so every island fails at its first step
+        with self.assertRaises(RuntimeError):
+            islands.run_islands(sequence=SEQUENCE, size=1, minEnergy=OPTIMAL_FITNESS, maxEvaluations=4000,
+                                islands=2, interval=200)
+
+
+class TestHarness(unittest.TestCase):
+    def setUp(self):
+        self.saved = (testing.POPULATION_SIZE, testing.SWITCH_MAX_EVALUATIONS)
+        testing.POPULATION_SIZE = 100
+        testing.SWITCH_MAX_EVALUATIONS = 2000
+
+    def tearDown(self):
+        testing.POPULATION_SIZE, testing.SWITCH_MAX_EVALUATIONS = self.saved
+
+    def test_seeded_runs_are_reproducible(self):
+        first = testing.run_single(1, 123)
+        Conformation.energyEvalSteps += 5000  # leftover count from other runs in this process
+        second = testing.run_single(1, 123)
+        self.assertEqual(first, second)
+        self.assertLessEqual(first[3], testing.SWITCH_MAX_EVALUATIONS)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_sequences_from_file(self):
+        sequences = benchmark.read_sequences()
+        self.assertEqual([length for length, _, _ in sequences], [20, 24, 25, 36, 48, 50, 60, 64, 85])
+        self.assertIn((24, SEQUENCE, OPTIMAL_FITNESS), sequences)
+        self.assertTrue(all(len(sequence) == length for length, sequence, _ in sequences))
+
+    def test_compare_flags_regressions(self):
+        baseline = {"micro/a/20": {"value": 1.0}, "micro/b/20": {"value": 1.0},
+                    "macro/evaluations_per_second/20": {"value": 1000.0, "higher_is_better": True},
+                    "macro/time_to_optimum/20": {"value": 1.0, "reached": False}}
+        results = {"micro/a/20": {"value": 1.1}, "micro/b/20": {"value": 1.5}, "micro/new/20": {"value": 9.0},
+                   "macro/evaluations_per_second/20": {"value": 500.0, "higher_is_better": True},
+                   "macro/time_to_optimum/20": {"value": 5.0, "reached": True}}
+        regressions = benchmark.compare(baseline, results, threshold=0.2)
+        self.assertEqual([key for key, _, _, _ in regressions], ["micro/b/20", "macro/evaluations_per_second/20"])
+        self.assertAlmostEqual(regressions[1][3], 1.0)
+
+    def test_time_to_optimum(self):
+        length, sequence, optimum = benchmark.read_sequences()[0]
+        first = benchmark.time_to_optimum(Protein(sequence), optimum)
+        second = benchmark.time_to_optimum(Protein(sequence), optimum)
+        self.assertTrue(first["reached"])
+        # Seeded, so the evaluations to the optimum are repeatable
+        self.assertEqual(first["evaluations"], second["evaluations"])
+
+
+class TestBounds(unittest.TestCase):
+    def test_bound_never_beats_known_optima(self):
+        for length, sequence, optimum in Bounds.read_sequences():
+            self.assertLessEqual(Bounds.energy_lower_bound(Protein(sequence)), optimum)
+            self.assertEqual(Bounds.known_optimum(sequence), optimum)
+
+    def test_bound_holds_for_every_fold(self):
+        random.seed(3)
+        for _ in range(5):
+            sequence = "".join(random.choice("BW") for _ in range(10))
+            hydrophobic = Protein(sequence).getHydrophobic()
+            best = min(fused_walk(encoding, hydrophobic)[1]
+                       for encoding in itertools.product((LEFT, FORWARD, RIGHT), repeat=8)
+                       if fused_walk(encoding, hydrophobic, score=False)[0])
+            self.assertGreaterEqual(best, Bounds.energy_lower_bound(Protein(sequence)))
+        self.assertEqual(Bounds.energy_lower_bound(Protein("BBB")), 0)
+
+    def test_target_energy(self):
+        self.assertEqual(Bounds.target_energy(Protein(SEQUENCE)), (OPTIMAL_FITNESS, "known optimum"))
+        prot = Protein("BWBWWBBWBWWBWBBWWBWW")
+        self.assertIsNone(Bounds.known_optimum(prot.sequence))
+        self.assertEqual(Bounds.target_energy(prot), (Bounds.energy_lower_bound(prot), "lower bound"))
+
+    def test_runner_stops_at_bound(self):
+        random.seed(5)
+        pop = Population(POP_SIZE, Protein(SEQUENCE), MUT_PROB, CROSS_PROB)
+        fitness = pop.get_fittest().get_fitness()
+        result = Runner(pop, None, 10 ** 9, bound=fitness).run()
+        self.assertEqual((result.reason, result.generations, result.gap), ("bound", 0, 0))
+        result = Runner(pop, OPTIMAL_FITNESS, 2000, bound=Bounds.energy_lower_bound(pop.protein)).run()
+        self.assertEqual(result.gap, result.fitness - result.bound)
+        self.assertGreaterEqual(result.gap, 0)
+
+
+class TestBatch(unittest.TestCase):
+    def test_longest_jobs_first(self):
+        jobs = batch.make_jobs(Bounds.read_sequences(), 2)
+        self.assertEqual(len(jobs), 18)
+        self.assertEqual([job[0] for job in jobs], sorted((job[0] for job in jobs), reverse=True))
+        self.assertEqual({job[3] for job in jobs}, {1, 2})
+
+    def test_results_in_one_file(self):
+        sequences = [s for s in Bounds.read_sequences() if s[0] in (20, 24)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "batch.csv")
+            rows, _ = batch.run_batch(batch.make_jobs(sequences, 2), workers=2, filename=path,
+                                      populationSize=40, maxEvaluations=500)
+            with open(path, newline="") as file:
+                logged = list(csv.DictReader(file))
+        self.assertEqual(len(logged), 4)
+        self.assertEqual(sorted((int(row["Length"]), int(row["Repetition"])) for row in logged),
+                         [(20, 1), (20, 2), (24, 1), (24, 2)])
+        for row in logged:
+            self.assertEqual(int(row["Gap"]), int(row["BestEnergy"]) - int(row["LowerBound"]))
+        # Seeded, so a rerun of a job reproduces its row
+        job = batch.make_jobs(sequences[:1], 1)[0]
+        first = batch.run_job(job, 40, 500)
+        self.assertEqual(batch.run_job(job, 40, 500)[:11], first[:11])
+
+
+class TestBayesianTrials(unittest.TestCase):
+    def test_trial_applies_switches_and_resets_state(self):
+        saved = {name: getattr(bays, name) for name in bays.TRIAL_SWITCHES}
+        switches = dict(saved, switch_sequence=SEQUENCE, switch_minen=OPTIMAL_FITNESS,
+                        switch_max_evaluations=2000, switch_enable_graphics=True)
+        try:
+            Conformation.energyEvalSteps = 10 ** 6
+            score = bays.run_trial(switches, {'population_size': 60, 'mutation_probability': MUT_PROB,
+                                              'crossover_probability': CROSS_PROB})
+        finally:
+            for name, value in saved.items():
+                setattr(bays, name, value)
+        self.assertGreater(score, 0)
+        self.assertLessEqual(Conformation.energyEvalSteps, 2000 + 2)
+
 
 class TestCalculation(unittest.TestCase):
     def test_final_result_reasonable(self):
@@ -1,81 +1,135 @@
 import csv
+import json
 import statistics
 import io
 import contextlib
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from Conformation import Conformation
 from Protein import Protein
 from Population import Population
+from FitnessCache import FitnessCache
+from Telemetry import Telemetry
+from Runner import Runner
+from Bounds import energy_lower_bound, target_energy
 
 # Configuration constants
 SEQUENCE = "BBWWBWWBWWBWWBWWBWWBWWBB"
 POPULATION_SIZE = 1000
 MUTATION_PROBABILITY = 0.05
 CROSSOVER_PROBABILITY = 0.85
-SWITCH_MIN_ENERGY = -9
+SWITCH_MIN_ENERGY = None       # energy to stop at (None = OPTIMAL_ENERGY)
 SWITCH_MAX_EVALUATIONS = 100000
 RUNS = 5
 CSV_FILENAME = "ga_24seq_results.csv"
-OPTIMAL_ENERGY = -9
-
-
-def create_silent_population(size, prot, mut_prob, cross_prob):
+OPTIMAL_ENERGY = None          # success threshold (None = known optimum of SEQUENCE, else its lower bound)
+BASE_SEED = 42                 # run i is seeded with BASE_SEED + i
+WORKERS = os.cpu_count() or 1  # parallel runs (1 = run serially in this process)
+FITNESS_CACHE_SIZE = 0         # entries in the per-run fitness cache (0 = no cache)
+COLLECT_METRICS = False        # log Population.metrics_snapshot() of every run as JSON
+CANONICAL_KEYS = False         # treat mirror-image conformations as duplicates (Population canonicalKeys)
+LOCAL_SEARCH_BUDGET = 0        # pull-move local search evaluations per promising child (0 = off)
+TELEMETRY_EVERY = 0            # generations between telemetry records, logged to telemetry_run<i>.hptl (0 = off)
+REPAIR_COLLISIONS = False      # re-grow colliding children instead of discarding them (Population repairCollisions)
+ADAPTIVE_OPERATORS = False     # pick mutation operators by probability matching (Population adaptiveOperators)
+COMPARE_REPAIR = False         # run every seed with repair off and on and compare the evaluations to the optimum
+
+
+def create_silent_population(size, prot, mut_prob, cross_prob, repair=REPAIR_COLLISIONS):
     temp_output = io.StringIO()
     with contextlib.redirect_stdout(temp_output):
-        population = Population(size, prot, mut_prob, cross_prob)
+        population = Population(size, prot, mut_prob, cross_prob, canonicalKeys=CANONICAL_KEYS,
+                                localSearchBudget=LOCAL_SEARCH_BUDGET, repairCollisions=repair,
+                                adaptiveOperators=ADAPTIVE_OPERATORS)
 
 
     return population
 
 
 
-def calculation(pop: Population):
-    Conformation.energyEvalSteps = 0
-    best = pop.get_fittest()
-    best_fitness = best.get_fitness()
-    best_eval = Conformation.energyEvalSteps
-    generation = 0
-    best_generation = 0
-    birth_generation = best.get_generation()
+def optimal_energy():
+    return OPTIMAL_ENERGY if OPTIMAL_ENERGY is not None else target_energy(Protein(SEQUENCE))[0]
+
 
-    while best.get_fitness() > SWITCH_MIN_ENERGY and Conformation.energyEvalSteps < SWITCH_MAX_EVALUATIONS:
-        pop.crossover()
-        generation += 1
-        current = pop.get_fittest()
-        if current.get_fitness() < best_fitness:
-            best_fitness = current.get_fitness()
-            best_eval = Conformation.energyEvalSteps
-            best_generation = generation
-            birth_generation = current.get_generation()
-            best = current
-    unique_confs = len(pop.setOfConformations)
-    return best_fitness, best_eval, unique_confs, best_generation, birth_generation
+def calculation(pop: Population, telemetry: Telemetry = None):
+    # Evaluations are counted from the start of this run, so runs sharing a process don't affect each other
+    stop = SWITCH_MIN_ENERGY if SWITCH_MIN_ENERGY is not None else optimal_energy()
+    result = Runner(pop, stop, SWITCH_MAX_EVALUATIONS, telemetry=telemetry,
+                    bound=energy_lower_bound(pop.protein)).run()
+    unique_confs = pop.insertedCount
+    return result.fitness, result.evaluationsToBest, unique_confs, result.generationsToBest, result.birthGeneration, \
+        result.gap
 
 
 
-def run_multiple_and_log():
+def run_single(run, seed, repair=REPAIR_COLLISIONS):
+    # One complete, seeded GA run; depends on nothing but its arguments so it can run in any worker process
+    random.seed(seed)
+    cache = FitnessCache(FITNESS_CACHE_SIZE) if FITNESS_CACHE_SIZE > 0 else None
+    Conformation.fitnessCache = cache
+    Conformation.canonicalCacheKeys = CANONICAL_KEYS
     prot = Protein(SEQUENCE)
-    with open(CSV_FILENAME, mode='w', newline='') as file:
+    pop = create_silent_population(
+        POPULATION_SIZE, prot, MUTATION_PROBABILITY, CROSSOVER_PROBABILITY, repair
+    )
+    if COLLECT_METRICS:
+        pop.enable_metrics()
+    telemetry = Telemetry(pop, f"telemetry_run{run}.hptl", TELEMETRY_EVERY) if TELEMETRY_EVERY > 0 else None
+    result = calculation(pop, telemetry)
+    if telemetry is not None:
+        telemetry.close()
+    Conformation.fitnessCache = None
+    metrics = json.dumps(pop.metrics_snapshot()) if COLLECT_METRICS else ""
+    # Final selection probability, quality and outcome counts of every mutation operator
+    credit = json.dumps(pop.operators.credit()) if pop.operators is not None else ""
+    # Cache hits and known children skipped before evaluation are not counted as evaluations,
+    # so report them next to EvalToBest as the budget they saved
+    skipped = (pop.duplicateSkips, pop.symmetrySkips)
+    # Local search evaluations are part of EvalToBest; logged separately to show their share
+    local = pop.localSearch.evaluations if pop.localSearch is not None else 0
+    return (run, seed) + result + (cache.hits if cache is not None else 0,) + skipped + \
+        (local, pop.repairSaved, pop.repaired_fraction(), credit, metrics)
+
+
+def run_multiple_and_log(workers=WORKERS, repair=REPAIR_COLLISIONS, csv_filename=CSV_FILENAME):
+    seeds = {i: BASE_SEED + i for i in range(1, RUNS + 1)}
+    with open(csv_filename, mode='w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow(["Run", "BestEnergy", "EvalToBest", "UniqueConformations", "GenerationsToBest", "BirthGenerationOfBest"])
-        for i in range(1, RUNS + 1):
-            pop = create_silent_population(
-                POPULATION_SIZE, prot, MUTATION_PROBABILITY, CROSSOVER_PROBABILITY
-            )
-            best_energy, evals_to_best, unique_confs, generations_to_best, birth_generation = calculation(pop)
-            writer.writerow([i, best_energy, evals_to_best, unique_confs, generations_to_best, birth_generation])
-            print(f"Run {i}: BestEnergy={best_energy}, EvalToBest={evals_to_best}, UniqueConfs={unique_confs}, GenerationsToBest={generations_to_best}, BirthGenerationOfBest={birth_generation}")
+        writer.writerow(["Run", "Seed", "BestEnergy", "EvalToBest", "UniqueConformations", "GenerationsToBest", "BirthGenerationOfBest", "GapToBound", "CacheHits", "DuplicateSkips", "SymmetrySkips", "LocalSearchEvals", "Repaired", "RepairedFraction", "OperatorCredit", "Metrics"])
+
+        def log(row):
+            # Stream every run into the CSV as soon as it completes
+            writer.writerow(row)
+            file.flush()
+            i, seed, best_energy, evals_to_best, unique_confs, generations_to_best, birth_generation, gap, cache_hits, duplicate_skips, symmetry_skips, local_evals, repaired, repaired_fraction, credit, metrics = row
+            print(f"Run {i}: BestEnergy={best_energy}, EvalToBest={evals_to_best}, UniqueConfs={unique_confs}, GenerationsToBest={generations_to_best}, BirthGenerationOfBest={birth_generation}, GapToBound={gap}, CacheHits={cache_hits}, DuplicateSkips={duplicate_skips}, SymmetrySkips={symmetry_skips}, LocalSearchEvals={local_evals}, Repaired={repaired} ({repaired_fraction:.1%})")
+
+        if workers <= 1:
+            for i, seed in seeds.items():
+                log(run_single(i, seed, repair))
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_single, i, seed, repair) for i, seed in seeds.items()]
+            for future in as_completed(futures):
+                log(future.result())
 
 
-def analyze_results():
+def analyze_results(csv_filename=CSV_FILENAME):
 
     energies = []
     evals = []
     generations = []
     births = []
     success_count = 0
-    with open(CSV_FILENAME, newline='') as file:
+    optimal = optimal_energy()
+    gaps = []
+    repaired = []
+    with open(csv_filename, newline='') as file:
         reader = csv.DictReader(file)
         for row in reader:
+            repaired.append(float(row['RepairedFraction']))
+            gaps.append(int(row['GapToBound']))
             energy = int(row['BestEnergy'])
             eval = int(row['EvalToBest'])
             gen = int(row['GenerationsToBest'])
@@ -84,7 +138,7 @@ def analyze_results():
             evals.append(eval)
             generations.append(gen)
             births.append(birth)
-            if energy <= OPTIMAL_ENERGY:
+            if energy <= optimal:
                 success_count += 1
 
     mean_energy = statistics.mean(energies)
@@ -102,9 +156,10 @@ def analyze_results():
     print("\n=== GA Performance Summary ===")
     print(f"Protein: {SEQUENCE}")
     print(f"Length: {Protein(SEQUENCE).getLength()}")
-    print(f"Optimal target energy: {OPTIMAL_ENERGY}")
-    print(f"Runs executed: {RUNS}")
-    print(f"Runs reaching optimal energy: {success_count}/{RUNS}")
+    print(f"Optimal target energy: {optimal}")
+    print(f"Lower bound on energy: {energy_lower_bound(Protein(SEQUENCE))}")
+    print(f"Runs executed: {len(energies)}")
+    print(f"Runs reaching optimal energy: {success_count}/{len(energies)}")
     print(f"Mean best energy: {mean_energy:.2f}")
     print(f"Std deviation of best energy: {stdev_energy:.2f}")
     print(f"Mean evaluations to best: {mean_eval:.2f}")
@@ -115,10 +170,42 @@ def analyze_results():
     print(f"Std deviation of birth generations: {stdev_birth:.2f}")
     print(f"Min evaluations: {min_eval}")
     print(f"Max evaluations: {max_eval}")
+    print(f"Mean gap between best energy and lower bound: {statistics.mean(gaps):.2f}")
+    print(f"Mean share of children saved by repair: {statistics.mean(repaired):.2%}")
+
+
+def evaluations_to_optimum(csv_filename):
+    # (mean EvalToBest of the runs that reached the optimal energy, how many did, mean RepairedFraction)
+    with open(csv_filename, newline='') as file:
+        rows = list(csv.DictReader(file))
+    optimal = optimal_energy()
+    reached = [int(row['EvalToBest']) for row in rows if int(row['BestEnergy']) <= optimal]
+    mean_evals = statistics.mean(reached) if reached else float("nan")
+    return mean_evals, len(reached), statistics.mean(float(row['RepairedFraction']) for row in rows)
+
+
+def compare_repair(workers=WORKERS):
+    # The same seeds with and without repair: the share of children repair saved and
+    # the change in evaluations to reach the known optimum
+    base, ext = os.path.splitext(CSV_FILENAME)
+    results = {}
+    for repair in (False, True):
+        csv_filename = f"{base}_repair{ext}" if repair else CSV_FILENAME
+        run_multiple_and_log(workers, repair, csv_filename)
+        results[repair] = evaluations_to_optimum(csv_filename)
+    (plain, plain_runs, _), (repaired, repaired_runs, fraction) = results[False], results[True]
+    print("\n=== Repair Comparison ===")
+    print(f"Children saved by repair: {fraction:.2%}")
+    print(f"Runs reaching optimal energy: {plain_runs}/{RUNS} without repair, {repaired_runs}/{RUNS} with repair")
+    print(f"Mean evaluations to optimum: {plain:.0f} without repair, {repaired:.0f} with repair "
+          f"({repaired / plain - 1:+.1%})")
 
 
 
 if __name__ == "__main__":
-    print(f"Starting {RUNS} silent GA runs on sequence of length {len(SEQUENCE)}...\n")
-    run_multiple_and_log()
-    analyze_results()
+    print(f"Starting {RUNS} silent GA runs on sequence of length {len(SEQUENCE)} with {WORKERS} workers...\n")
+    if COMPARE_REPAIR:
+        compare_repair()
+    else:
+        run_multiple_and_log()
+        analyze_results()